@@ -0,0 +1,171 @@
+# === MATERIALIZED AGGREGATES (per bulan / type / kategori) ===
+# Running sum per (bulan, type, kategori) untuk cashflow.json & income.json disimpan di
+#   <user>/aggregates.json
+#   {"version": 1, "sources": {"cashflow.json": {"2025-10": {
+#       "sig": [mtime_ns, size],                    ← versi partisi saat dihitung
+#       "totals": {"expense": {"Makan": 150000}},
+#       "loans": {"LN001": 1000000}}}}}            ← pembayaran loan per ID liabilitas
+# JsonBackend.append() menambah 1 record langsung ke bucket bulannya; save() (rewrite)
+# cukup memvalidasi ulang partisi yang berubah. Bulan yang signature-nya tidak cocok lagi
+# dengan partisinya (ditulis proses lain, diedit manual) dihitung ulang dari kolom NumPy,
+# jadi dashboard / history / net worth cukup O(jumlah bulan).
+# Di SQLite padanannya tabel `aggregates` yang dirawat trigger (storage.py).
+
+import os, json
+import ledger
+import columnar
+from columnar import rupiah
+from doc_cache import read_json, file_signature
+
+
+FILENAME = "aggregates.json"
+VERSION = 2
+
+
+def _agg_path(path):
+    return os.path.join(os.path.dirname(path), FILENAME)
+
+
+def _read(path):
+    try:
+        doc = read_json(_agg_path(path))
+    except (OSError, ValueError):
+        return {"version": VERSION, "sources": {}}
+    if not isinstance(doc, dict) or doc.get("version") != VERSION:
+        return {"version": VERSION, "sources": {}}
+    return doc
+
+
+def _write(path, doc):
+    ledger.write_atomic(_agg_path(path), json.dumps(doc, ensure_ascii=False))
+
+
+def _signature(file_path):
+    try:
+        return list(file_signature(file_path))
+    except OSError:
+        return None
+
+
+def _is_loan_payment(entry):
+    return (entry.get("type") == "expense"
+            and str(entry.get("category") or "").lower() == "loan")
+
+
+def _paid(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def scan_loan_payments(rows):
+    """{ID liabilitas: total dibayar} dari expense kategori Loan (note = ID), 1 pass"""
+    paid = {}
+    for r in rows:
+        if isinstance(r, dict) and _is_loan_payment(r):
+            loan_id = str(r.get("note") or "").strip()
+            paid[loan_id] = paid.get(loan_id, 0) + _paid(r.get("amount", 0))
+    return paid
+
+
+def _compute(path, month):
+    """Bucket 1 bulan dihitung ulang dari partisinya"""
+    cols = columnar.cached(ledger.partition_path(path, month), lambda: ledger.read_month(path, month))
+    totals = {}
+    for (t, category), total in cols.category_totals_flat().items():
+        totals.setdefault(t, {})[category] = total
+    return {"totals": totals, "loans": scan_loan_payments(ledger.read_month(path, month))}
+
+
+def _category(entry):
+    return entry.get("category", entry.get("stream", "")) or ""
+
+
+# --- tulis ---
+def record_append(path, entry, result):
+    """
+    Tambah 1 record ke bucket bulannya. result = (bulan, sig sebelum, sig sesudah) dari
+    ledger.append; kalau bucket tidak berada di versi 'sebelum' (ada penulis lain),
+    bucket dibuang dan dihitung ulang saat dibaca.
+    """
+    month, before, after = result
+    with ledger.locked(_agg_path(path)):
+        doc = _read(path)
+        source = doc["sources"].setdefault(os.path.basename(path), {})
+        bucket = source.get(month)
+        if bucket is None and before is None:
+            bucket = {"sig": None, "totals": {}, "loans": {}}
+        if bucket is None or bucket.get("sig") != before:
+            source.pop(month, None)
+        else:
+            t = entry.get("type", "income")
+            cats = bucket["totals"].setdefault(t, {})
+            cat = _category(entry)
+            cats[cat] = cats.get(cat, 0) + rupiah(entry.get("amount", 0))
+            if _is_loan_payment(entry):
+                loans = bucket.setdefault("loans", {})
+                loan_id = str(entry.get("note") or "").strip()
+                loans[loan_id] = loans.get(loan_id, 0) + _paid(entry.get("amount", 0))
+            bucket["sig"] = after
+            source[month] = bucket
+        _write(path, doc)
+
+
+def refresh(path, rebuild=False):
+    """
+    Pastikan semua bulan sinkron dengan partisinya (hanya bulan yang berubah dihitung ulang).
+    Return {bulan: bucket} dengan bucket = {"sig", "totals", "loans"}.
+    """
+    name = os.path.basename(path)
+    doc = _read(path)
+    source = doc["sources"].get(name, {})
+    fresh, changed = {}, rebuild
+    for month in ledger.months(path):
+        sig = _signature(ledger.partition_path(path, month))
+        bucket = source.get(month)
+        if rebuild or bucket is None or bucket.get("sig") != sig:
+            bucket = {"sig": sig, **_compute(path, month)}
+            changed = True
+        fresh[month] = bucket
+    if changed or set(fresh) != set(source):
+        with ledger.locked(_agg_path(path)):
+            doc = _read(path)
+            doc["sources"][name] = fresh
+            _write(path, doc)
+    return fresh
+
+
+def rebuild(path):
+    """Hitung ulang semua bulan dari ledger mentah. Return jumlah bulan."""
+    return len(refresh(path, rebuild=True))
+
+
+# --- baca ---
+def monthly_totals(path):
+    """{'YYYY-MM': {type: total}} (record tanpa tanggal valid tidak masuk)"""
+    return {
+        month: {t: sum(cats.values()) for t, cats in bucket["totals"].items()}
+        for month, bucket in refresh(path).items()
+        if month != ledger.UNDATED
+    }
+
+
+def type_totals(path, month=None):
+    """{type: total}, opsional hanya 1 bulan"""
+    out = {}
+    for label, bucket in refresh(path).items():
+        if month and label != month:
+            continue
+        for t, cats in bucket["totals"].items():
+            out[t] = out.get(t, 0) + sum(cats.values())
+    return out
+
+
+def loan_payments(path):
+    """Indeks pembayaran loan {ID liabilitas: total dibayar}, O(jumlah bulan)"""
+    out = {}
+    for bucket in refresh(path).values():
+        for loan_id, paid in bucket.get("loans", {}).items():
+            out[loan_id] = out.get(loan_id, 0) + paid
+    return out
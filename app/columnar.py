@@ -0,0 +1,172 @@
+# === COLUMNAR LEDGER ENGINE (NumPy) ===
+# Tampilan kolom dari list transaksi (cashflow / income):
+#   amount   int64  (rupiah, dibulatkan)
+#   month    int32  (ordinal tahun*12 + bulan-1, -1 = tanpa tanggal valid)
+#   type     int16  (kode → LedgerColumns.types)
+#   category int32  (kode → LedgerColumns.categories)
+# Dibangun 1x per versi file (mtime, size) lalu semua total per bulan/type/kategori
+# dihitung dengan kernel np.bincount, bukan loop dict per request.
+
+import threading
+from collections import OrderedDict
+import numpy as np
+from ledger import month_of
+from doc_cache import file_signature
+
+
+MAX_ENTRIES = 512
+
+
+def rupiah(value):
+    """Nominal → integer rupiah (nilai rusak dianggap 0)"""
+    try:
+        return int(round(float(value or 0)))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def month_ordinal(label):
+    """'2025-10' → 2025*12 + 9; None/undated → -1"""
+    if not label or len(label) != 7:
+        return -1
+    return int(label[:4]) * 12 + int(label[5:7]) - 1
+
+
+def month_label(ordinal):
+    year, month = divmod(int(ordinal), 12)
+    return f"{year:04d}-{month + 1:02d}"
+
+
+def _encode(values, codes, labels):
+    out = np.empty(len(values), dtype=np.int32)
+    for i, v in enumerate(values):
+        code = codes.get(v)
+        if code is None:
+            code = codes[v] = len(labels)
+            labels.append(v)
+        out[i] = code
+    return out
+
+
+class LedgerColumns:
+    """Kolom NumPy untuk 1 file/partisi ledger."""
+
+    def __init__(self, rows, default_type="income"):
+        rows = [r for r in rows if isinstance(r, dict)]
+        n = len(rows)
+        self.types, self.categories = [], []
+        self.amount = np.fromiter((rupiah(r.get("amount", 0)) for r in rows), dtype=np.int64, count=n)
+        self.month = np.fromiter(
+            (month_ordinal(month_of(r.get("date", ""))) for r in rows), dtype=np.int32, count=n
+        )
+        self.type = _encode([r.get("type", default_type) for r in rows], {}, self.types).astype(np.int16)
+        self.category = _encode(
+            [r.get("category", r.get("stream", "")) or "" for r in rows], {}, self.categories
+        )
+
+    def __len__(self):
+        return len(self.amount)
+
+    def _mask(self, month=None):
+        if month is None:
+            return slice(None)
+        return self.month == month_ordinal(month)
+
+    def totals(self, month=None):
+        """{type: total} (opsional hanya 1 bulan YYYY-MM)"""
+        if not len(self):
+            return {}
+        mask = self._mask(month)
+        sums = np.bincount(self.type[mask], weights=self.amount[mask], minlength=len(self.types))
+        counts = np.bincount(self.type[mask], minlength=len(self.types))
+        return {t: int(round(sums[i])) for i, t in enumerate(self.types) if counts[i]}
+
+    def category_totals_flat(self):
+        """{(type, category): total} untuk semua baris (termasuk yang tanpa tanggal valid)"""
+        if not len(self):
+            return {}
+        n_cat = len(self.categories)
+        pair = self.type.astype(np.int64) * n_cat + self.category
+        sums = np.bincount(pair, weights=self.amount, minlength=len(self.types) * n_cat)
+        counts = np.bincount(pair, minlength=len(self.types) * n_cat)
+        out = {}
+        for p in np.nonzero(counts)[0]:
+            t, c = divmod(int(p), n_cat)
+            out[(self.types[t], self.categories[c])] = int(round(sums[p]))
+        return out
+
+    def _grouped(self, codes, n_codes):
+        """Jumlah per (bulan, kode) → (ordinal bulan pertama, matriks sums, matriks counts)"""
+        valid = self.month >= 0
+        if not valid.any():
+            return 0, np.zeros((0, n_codes)), np.zeros((0, n_codes), dtype=np.int64)
+        month = self.month[valid]
+        base = int(month.min())
+        span = int(month.max()) - base + 1
+        key = (month - base).astype(np.int64) * n_codes + codes[valid]
+        sums = np.bincount(key, weights=self.amount[valid], minlength=span * n_codes)
+        counts = np.bincount(key, minlength=span * n_codes)
+        return base, sums.reshape(span, n_codes), counts.reshape(span, n_codes)
+
+    def monthly_totals(self):
+        """{'YYYY-MM': {type: total}} untuk semua bulan yang punya transaksi"""
+        base, sums, counts = self._grouped(self.type, len(self.types))
+        out = {}
+        for m, t in zip(*np.nonzero(counts)):
+            out.setdefault(month_label(base + m), {})[self.types[t]] = int(round(sums[m, t]))
+        return out
+
+    def category_totals(self):
+        """{'YYYY-MM': {(type, category): total}}"""
+        n_cat = max(len(self.categories), 1)
+        pair = self.type.astype(np.int64) * n_cat + self.category
+        n_pairs = max(len(self.types), 1) * n_cat
+        base, sums, counts = self._grouped(pair, n_pairs)
+        out = {}
+        for m, p in zip(*np.nonzero(counts)):
+            t, c = divmod(int(p), n_cat)
+            out.setdefault(month_label(base + m), {})[(self.types[t], self.categories[c])] = int(round(sums[m, p]))
+        return out
+
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+EMPTY = LedgerColumns([])
+
+
+def cached(file_path, loader):
+    """LedgerColumns untuk file_path, dibangun ulang hanya kalau (mtime, size) berubah"""
+    try:
+        signature = file_signature(file_path)
+    except OSError:
+        return EMPTY
+    with _lock:
+        hit = _cache.get(file_path)
+        if hit is not None and hit[0] == signature:
+            _cache.move_to_end(file_path)
+            return hit[1]
+    cols = LedgerColumns(loader())
+    with _lock:
+        _cache[file_path] = (signature, cols)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return cols
+
+
+def merge_totals(parts):
+    """Gabungkan beberapa dict {key: total}"""
+    out = {}
+    for part in parts:
+        for k, v in part.items():
+            out[k] = out.get(k, 0) + v
+    return out
+
+
+def merge_monthly(parts):
+    out = {}
+    for part in parts:
+        for month, totals in part.items():
+            bucket = out.setdefault(month, {})
+            for k, v in totals.items():
+                bucket[k] = bucket.get(k, 0) + v
+    return out
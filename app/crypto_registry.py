@@ -0,0 +1,124 @@
+# === REGISTRY SIMBOL CRYPTO (ticker → id CoinGecko) ===
+# Mapping disimpan di <DATA_DIR>/crypto_symbols.json:
+#   {"version": 1, "ids": {"BTC": "bitcoin", ...}, "unresolved": {"XYZ": <epoch gagal>}}
+# Ticker yang belum dikenal di-resolve sekali lewat endpoint search CoinGecko (coin
+# dengan simbol sama & market cap rank terbaik) lalu disimpan, jadi coin apa pun yang
+# dibeli user ikut ter-valuasi tanpa mengubah kode. Ticker yang tidak ketemu dicoba lagi
+# setelah RETRY_UNRESOLVED detik. Tiap simpan di-merge dengan isi file di bawah file
+# lock, jadi hasil resolve dari worker gunicorn lain tidak saling menimpa.
+
+import os, json, time, threading
+import ledger
+import price_http
+
+
+SEARCH_URL = "https://api.coingecko.com/api/v3/search"
+RETRY_UNRESOLVED = 24 * 3600
+SEARCH_TIMEOUT = 5
+
+# mapping awal (daftar lama yang dulu di-hardcode)
+SEED = {
+    "BTC": "bitcoin", "ETH": "ethereum", "ADA": "cardano", "SOL": "solana",
+    "DOT": "polkadot", "VELO": "velo", "SUI": "sui", "ENA": "ethena", "XRP": "xrp",
+    "CKB": "nervos-network", "BNB": "binancecoin", "GT": "gatechain-token",
+}
+
+
+def _normalize(symbol):
+    return (symbol or "").upper().strip()
+
+
+def search_id(symbol):
+    """Id CoinGecko untuk ticker (exact match simbol, market cap rank terbaik) atau None"""
+    r = price_http.client("coingecko").get_json(SEARCH_URL, params={"query": symbol}, timeout=SEARCH_TIMEOUT)
+    matches = [c for c in r.get("coins", []) if _normalize(c.get("symbol")) == symbol and c.get("id")]
+    if not matches:
+        return None
+    matches.sort(key=lambda c: c.get("market_cap_rank") or float("inf"))
+    return matches[0]["id"]
+
+
+class SymbolRegistry:
+    """Mapping ticker → id provider, persisten di file JSON (path None = hanya di memori)."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._ids = dict(SEED)
+        self._unresolved = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                doc = json.load(f)
+            return doc if isinstance(doc, dict) else {}
+        except (OSError, ValueError) as e:
+            print("[PRICE] Registry crypto tidak terbaca:", e)
+            return {}
+
+    def _merge(self, doc):
+        self._ids.update({_normalize(k): v for k, v in (doc.get("ids") or {}).items() if v})
+        self._unresolved.update(doc.get("unresolved") or {})
+        for sym in self._ids:
+            self._unresolved.pop(sym, None)
+
+    def _load(self):
+        self._merge(self._read())
+
+    def _save(self, ids=None, unresolved=None):
+        """
+        Merge perubahan (ids / unresolved) dengan file di disk di bawah file lock, lalu
+        tulis atomic (tmp per pid + replace). Panggil dengan _lock dipegang.
+        """
+        changes = {"ids": ids or {}, "unresolved": unresolved or {}}
+        if not self.path:
+            self._merge(changes)
+            return
+        try:
+            with ledger.locked(self.path):
+                self._merge(self._read())
+                self._merge(changes)
+                doc = {"version": 1, "ids": self._ids, "unresolved": self._unresolved}
+                ledger.write_atomic(self.path, json.dumps(doc, indent=2))
+        except OSError as e:
+            print("[PRICE] Gagal simpan registry crypto:", e)
+
+    def set(self, symbol, provider_id):
+        """Override manual mapping 1 ticker"""
+        with self._lock:
+            self._ids[_normalize(symbol)] = provider_id
+            self._save(ids={_normalize(symbol): provider_id})
+
+    def mapping(self):
+        with self._lock:
+            return dict(self._ids)
+
+    def provider_ids(self, symbols):
+        """{ticker: id provider} untuk symbols; ticker baru di-resolve & disimpan"""
+        symbols = {_normalize(s) for s in symbols} - {""}
+        now = time.time()
+        with self._lock:
+            todo = [s for s in symbols if s not in self._ids
+                    and now - self._unresolved.get(s, 0) >= RETRY_UNRESOLVED]
+        found, missed = {}, []
+        for sym in sorted(todo):
+            try:
+                cg_id = search_id(sym)
+            except price_http.CircuitOpen:
+                break
+            except Exception as e:
+                print(f"[PRICE] Lookup id crypto {sym} gagal:", e)
+                continue
+            if cg_id:
+                found[sym] = cg_id
+            else:
+                missed.append(sym)
+        with self._lock:
+            if found or missed:
+                for sym in missed:
+                    print(f"[PRICE] Simbol crypto {sym} tidak ditemukan di CoinGecko")
+                self._save(ids=found, unresolved={sym: now for sym in missed})
+            return {s: self._ids[s] for s in symbols if s in self._ids}
@@ -0,0 +1,126 @@
+# === DOCUMENT CACHE ===
+# Cache dokumen JSON per-proses yang dipakai load_json (main.py & helpers.py).
+# Key = (folder user, nama file), divalidasi dengan (mtime, size, inode) file di disk,
+# jadi JSON hanya di-parse ulang kalau file benar-benar berubah.
+
+import os, json, threading
+from collections import OrderedDict
+
+
+MAX_ENTRIES = int(os.getenv("BUKABOX_DOC_CACHE_ENTRIES", "256"))
+MAX_BYTES = int(float(os.getenv("BUKABOX_DOC_CACHE_MB", "64")) * 1024 * 1024)
+
+
+def clone(obj):
+    """Salin struktur list/dict hasil JSON (jauh lebih murah dari parse ulang / deepcopy)"""
+    if isinstance(obj, list):
+        return [clone(x) for x in obj]
+    if isinstance(obj, dict):
+        return {k: clone(v) for k, v in obj.items()}
+    return obj
+
+
+def cache_key(path):
+    """Key cache: (folder user, nama file) dari path absolut yang sudah dinormalisasi"""
+    path = os.path.normpath(os.path.abspath(path))
+    return os.path.dirname(path), os.path.basename(path)
+
+
+def file_signature(path):
+    """
+    Versi file di disk: (mtime_ns, size, inode). Raise OSError jika file tidak ada.
+    Inode ikut dicek karena os.replace() dengan ukuran sama dalam resolusi mtime yang
+    sama tidak mengubah (mtime, size).
+    """
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class DocumentCache:
+    """LRU cache dokumen dengan batas jumlah entry & perkiraan memori (ukuran file)."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (signature, data, cost)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, signature, loader, cost=0):
+        """Kembalikan salinan data untuk key; panggil loader() hanya jika versi berubah"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return clone(entry[1])
+            self.misses += 1
+
+        data = loader()
+        self.put(key, signature, data, cost)
+        return clone(data)
+
+    def put(self, key, signature, data, cost=0):
+        with self._lock:
+            self._drop(key)
+            if cost > self.max_bytes:
+                return
+            self._entries[key] = (signature, data, cost)
+            self._bytes += cost
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                old_key = next(iter(self._entries))
+                self._drop(old_key)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+
+cache = DocumentCache()
+
+
+def _parse(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_json(path):
+    """
+    Baca file JSON lewat cache proses.
+    OSError / JSONDecodeError tetap dilempar supaya pemanggil bisa fallback seperti biasa.
+    """
+    signature = file_signature(path)
+    return cache.get(cache_key(path), signature, lambda: _parse(path), cost=signature[1])
+
+
+def invalidate(path):
+    """Buang entry cache untuk path ini (dipanggil setelah save_json)"""
+    cache.invalidate(cache_key(path))
@@ -1,5 +1,6 @@
 import os, json
 from flask import session
+from uow import backend
 
 from flask import session
 import os
@@ -26,18 +27,32 @@ def get_user_dir():
     return base_dir
 
 
-def load_json(filename):
-    path = os.path.join(get_user_dir(), filename)
-    if not os.path.exists(path):
+def load_json(filename, user_dir=None):
+    user_dir = user_dir or get_user_dir()
+    if not backend.exists(user_dir, filename):
         return []
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return backend.load(user_dir, filename)
     except Exception:
         return []
 
-def save_json(filename, data):
-    path = os.path.join(get_user_dir(), filename)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def save_json(filename, data, user_dir=None):
+    backend.save(user_dir or get_user_dir(), filename, data, indent=2)
+
+def append_json(filename, entry):
+    """Tambah 1 record; file ledger (cashflow/income) cukup append 1 baris JSONL"""
+    backend.append(get_user_dir(), filename, entry, indent=2)
+
+def data_version(*filenames, user_dir=None):
+    """Penanda versi gabungan beberapa file; None kalau ada yang belum di-flush"""
+    user_dir = user_dir or get_user_dir()
+    versions = tuple(backend.version(user_dir, f) for f in filenames)
+    return None if None in versions else (user_dir,) + versions
+
+def type_totals(filename, month=None, user_dir=None):
+    """Total amount per type dari file list (query backend)"""
+    return backend.type_totals(user_dir or get_user_dir(), filename, month)
+
+def loan_payments(user_dir=None):
+    """Indeks {ID liabilitas: total dibayar} dari expense kategori Loan (query backend)"""
+    return backend.loan_payments(user_dir or get_user_dir())
@@ -0,0 +1,326 @@
+# === TRANSACTION LEDGER (partisi per bulan, append-only JSONL) ===
+# cashflow.json & income.json disimpan sebagai partisi JSONL per bulan:
+#   <user>/cashflow/2025-10.jsonl      ← 1 baris per transaksi (append + fsync)
+#   <user>/cashflow/manifest.json      ← daftar partisi yang ada
+#   <user>/cashflow/order.log          ← bulan tiap record, urut waktu insert (1 baris/record)
+# Insert cukup append 1 baris ke partisi bulannya (O(1) I/O), tampilan bulan berjalan
+# cukup membuka 1 partisi, dan agregat all-time membaca partisi satu per satu (generator).
+# load_json("cashflow.json") tetap mengembalikan list lengkap dengan urutan insert seperti
+# dulu (disusun ulang dari order.log), jadi data.pop() tetap membuang record terakhir.
+#
+# Format lama (cashflow.json + cashflow.jsonl) otomatis dimigrasi saat pertama diakses;
+# file lama di-rename ke *.migrated. BUKABOX_LEDGER=0 kembali ke file JSON tunggal:
+# cashflow.json ditulis ulang dari partisi dan folder partisi di-rename ke *.rolledback
+# (saat BUKABOX_LEDGER=1 lagi, cashflow.json dimigrasi ulang seperti biasa).
+
+import os, json, fcntl, shutil, datetime
+from contextlib import contextmanager
+from doc_cache import cache, cache_key, file_signature, read_json, invalidate
+
+
+LEDGER_FILES = {"cashflow.json", "income.json"}
+LEDGER_MODE = os.getenv("BUKABOX_LEDGER", "1") != "0"
+UNDATED = "undated"
+
+
+def month_of(date_str):
+    """Label bulan (YYYY-MM) dari tanggal transaksi, None jika format tidak dikenal"""
+    if not date_str or not isinstance(date_str, str):
+        return None
+    # jalur cepat untuk format ISO (YYYY-MM-DD / YYYY-MM) tanpa strptime
+    if len(date_str) in (7, 10) and date_str[4] == "-" and date_str[:4].isdigit() and date_str[5:7].isdigit():
+        if 1 <= int(date_str[5:7]) <= 12 and (len(date_str) == 7 or (date_str[7] == "-" and date_str[8:].isdigit())):
+            return date_str[:7]
+    for fmt in ("%Y-%m-%d", "%Y-%m", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(date_str, fmt).strftime("%Y-%m")
+        except ValueError:
+            continue
+    return None
+
+
+def is_ledger(path):
+    """File ini disimpan sebagai partisi ledger?"""
+    return LEDGER_MODE and os.path.basename(path) in LEDGER_FILES
+
+
+def partition_dir(path):
+    return os.path.splitext(path)[0]
+
+
+def tail_path(path):
+    """Tail JSONL format lama (sebelum partisi)"""
+    return os.path.splitext(path)[0] + ".jsonl"
+
+
+def _manifest_path(path):
+    return os.path.join(partition_dir(path), "manifest.json")
+
+
+def _order_path(path):
+    return os.path.join(partition_dir(path), "order.log")
+
+
+def partition_path(path, month):
+    return os.path.join(partition_dir(path), f"{month}.jsonl")
+
+
+def _signature(file_path):
+    try:
+        return list(file_signature(file_path))
+    except OSError:
+        return None
+
+
+def exists(path):
+    return (os.path.exists(_manifest_path(path)) or os.path.exists(path)
+            or os.path.exists(tail_path(path)))
+
+
+@contextmanager
+def locked(path):
+    """Lock exclusive antar proses (gunicorn worker) untuk append & rewrite"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# --- baca ---
+def _parse_jsonl(file_path):
+    rows = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                # baris terakhir bisa terpotong kalau proses mati saat menulis
+                print(f"[LEDGER] Baris {n} rusak di {file_path}, dilewati")
+    return rows
+
+
+def _read_jsonl(file_path):
+    try:
+        signature = file_signature(file_path)
+    except OSError:
+        return []
+    return cache.get(cache_key(file_path), signature, lambda: _parse_jsonl(file_path), cost=signature[1])
+
+
+def months(path):
+    """Daftar partisi (YYYY-MM, urut) dari manifest"""
+    _ensure_migrated(path)
+    try:
+        return read_json(_manifest_path(path)).get("partitions", [])
+    except (OSError, ValueError, AttributeError):
+        return []
+
+
+def read_month(path, month):
+    """Semua record 1 bulan: cukup buka 1 partisi"""
+    _ensure_migrated(path)
+    return _read_jsonl(partition_path(path, month))
+
+
+def iter_rows(path):
+    """Generator semua record, partisi demi partisi (untuk agregat all-time)"""
+    for month in months(path):
+        yield from _read_jsonl(partition_path(path, month))
+
+
+def _read_order(path):
+    """Bulan tiap record sesuai urutan insert, None kalau order.log belum ada"""
+    try:
+        with open(_order_path(path), encoding="utf-8") as f:
+            return f.read().split()
+    except OSError:
+        return None
+
+
+def read(path):
+    """Isi lengkap ledger sebagai list dengan urutan insert (kompatibel dengan load_json lama)"""
+    month_list = months(path)
+    order = _read_order(path)
+    if order is None:
+        return list(iter_rows(path))
+    parts = {m: iter(_read_jsonl(partition_path(path, m))) for m in month_list}
+    rows = []
+    for month in order:
+        row = next(parts.get(month, iter(())), None)
+        if row is not None:
+            rows.append(row)
+    # record yang tidak tercatat di order.log (proses mati di antara 2 tulis) → di belakang
+    for month in month_list:
+        rows.extend(parts[month])
+    return rows
+
+
+def version(path):
+    """Versi ledger = signature manifest + urutan + semua partisi (berubah di setiap tulis)"""
+    return (_signature(_manifest_path(path)), _signature(_order_path(path))) + tuple(
+        _signature(partition_path(path, month)) for month in months(path)
+    )
+
+
+# --- tulis ---
+def _month_key(row):
+    date = row.get("date", "") if isinstance(row, dict) else ""
+    return month_of(date) or UNDATED
+
+
+def _group(rows):
+    groups = {}
+    for r in rows:
+        groups.setdefault(_month_key(r), []).append(r)
+    return groups
+
+
+def write_atomic(file_path, text):
+    tmp = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, file_path)
+    invalidate(file_path)
+
+
+def _write_partition(path, month, rows):
+    text = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+    write_atomic(partition_path(path, month), text)
+
+
+def _write_manifest(path, month_list):
+    manifest = {"version": 1, "partitions": sorted(set(month_list))}
+    write_atomic(_manifest_path(path), json.dumps(manifest, indent=2))
+
+
+def _write_order(path, rows):
+    write_atomic(_order_path(path), "".join(f"{_month_key(r)}\n" for r in rows))
+
+
+def _ensure_order(path):
+    """Ledger dari sebelum order.log ada: anggap urutan insert = urutan partisi (dipanggil di dalam lock)"""
+    if not os.path.exists(_order_path(path)):
+        _write_order(path, list(iter_rows(path)))
+
+
+def _ensure_migrated(path):
+    """Pecah cashflow.json (+ cashflow.jsonl) format lama menjadi partisi bulanan"""
+    if os.path.exists(_manifest_path(path)):
+        return
+    legacy_tail = tail_path(path)
+    if not (os.path.exists(path) or os.path.exists(legacy_tail)):
+        return
+    with locked(path):
+        if os.path.exists(_manifest_path(path)):
+            return
+        rows = []
+        if os.path.exists(path):
+            base = read_json(path)
+            rows = base if isinstance(base, list) else []
+        if os.path.exists(legacy_tail):
+            rows += _parse_jsonl(legacy_tail)
+
+        os.makedirs(partition_dir(path), exist_ok=True)
+        groups = _group(rows)
+        for month, month_rows in groups.items():
+            _write_partition(path, month, month_rows)
+        _write_order(path, rows)
+        _write_manifest(path, groups.keys())
+
+        if os.path.exists(path):
+            os.replace(path, path + ".migrated")
+            invalidate(path)
+        if os.path.exists(legacy_tail):
+            os.remove(legacy_tail)
+        print(f"[LEDGER] Migrasi {path}: {len(rows)} record → {len(groups)} partisi")
+
+
+def append(path, entry):
+    """
+    Append 1 record ke partisi bulannya (1 baris JSONL + fsync).
+    Return (bulan, signature partisi sebelum, sesudah) untuk update agregat.
+    """
+    _ensure_migrated(path)
+    month = _month_key(entry)
+    part = partition_path(path, month)
+    line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+    with locked(path):
+        os.makedirs(partition_dir(path), exist_ok=True)
+        _ensure_order(path)
+        before = _signature(part)
+        fd = os.open(part, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        invalidate(part)
+        # urutan dicatat sesudah partisi; kalau baris ini hilang, read() menaruh record di belakang
+        with open(_order_path(path), "a", encoding="utf-8") as f:
+            f.write(f"{month}\n")
+        current = months(path)
+        if month not in current:
+            _write_manifest(path, current + [month])
+        return month, before, _signature(part)
+
+
+def write_all(path, data):
+    """Tulis ulang ledger dari list lengkap; hanya partisi yang berubah yang ditulis"""
+    _ensure_migrated(path)
+    groups = _group(data if isinstance(data, list) else [])
+    with locked(path):
+        os.makedirs(partition_dir(path), exist_ok=True)
+        current = months(path)
+        for month, rows in groups.items():
+            if month in current and _read_jsonl(partition_path(path, month)) == rows:
+                continue
+            _write_partition(path, month, rows)
+        for month in current:
+            if month not in groups:
+                os.remove(partition_path(path, month))
+                invalidate(partition_path(path, month))
+        _write_order(path, data if isinstance(data, list) else [])
+        _write_manifest(path, groups.keys())
+
+
+def restore_legacy(path):
+    """
+    BUKABOX_LEDGER=0: tulis balik cashflow.json (urutan insert) dari partisi, lalu rename
+    folder partisi ke *.rolledback supaya backend JSON tunggal melihat data lengkap.
+    """
+    if LEDGER_MODE or os.path.basename(path) not in LEDGER_FILES:
+        return
+    if not os.path.exists(_manifest_path(path)):
+        return
+    with locked(path):
+        if not os.path.exists(_manifest_path(path)):
+            return
+        rows = read(path)
+        write_atomic(path, json.dumps(rows, indent=4, ensure_ascii=False))
+        backup = partition_dir(path) + ".rolledback"
+        shutil.rmtree(backup, ignore_errors=True)
+        os.replace(partition_dir(path), backup)
+        print(f"[LEDGER] Rollback {path}: {len(rows)} record dari partisi → JSON tunggal")
+
+
+def compact(path):
+    """Migrasi format lama & tulis ulang semua partisi (buang baris rusak). Return jumlah partisi."""
+    if not exists(path):
+        return 0
+    _ensure_migrated(path)
+    with locked(path):
+        current = months(path)
+        for month in current:
+            part = partition_path(path, month)
+            _write_partition(path, month, _parse_jsonl(part) if os.path.exists(part) else [])
+        _write_manifest(path, current)
+    print(f"[LEDGER] Compact {path}: {len(current)} partisi")
+    return len(current)
@@ -1,17 +1,22 @@
-import os, json, datetime, requests, webbrowser, socket
+import os, io, json, datetime, requests, webbrowser, socket
 from flask import Flask, render_template, request, redirect, url_for, jsonify,  send_file, flash
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 import time
 import requests
-from functools import lru_cache
 from functools import wraps
+import click
 from flask import session
 from werkzeug.security import generate_password_hash, check_password_hash
 import calendar
 from helpers import load_json
+import ledger
+import prices
+import price_http
+import report_cache
+import report_engine
+import report_jobs
+from storage import month_of
+from uow import backend
+import uow
 from networth_integration_v46 import networth_bp
 
 
@@ -19,6 +24,7 @@ app = Flask(__name__)
 
 app.secret_key = os.getenv("FLASK_SECRET", "dev_secret")
 app.register_blueprint(networth_bp)
+uow.init_app(app)
 
 def user_data_path(username, filename):
     """Path adaptif (lokal vs Fly.io)"""
@@ -82,12 +88,14 @@ HISTORY_DIR = os.path.join(DATA_DIR, "history")
 REPORT_DIR  = os.path.join(DATA_DIR, "reports")
 
 os.makedirs(DATA_DIR, exist_ok=True)
+prices.init_store(DATA_DIR)
 os.makedirs(HISTORY_DIR, exist_ok=True)
 os.makedirs(REPORT_DIR, exist_ok=True)
+report_engine.warm_up()
 
 for f in ["income.json", "cashflow.json", "investment.json", "emergency.json"]:
     path = os.path.join(DATA_DIR, f)
-    if not os.path.exists(path):
+    if not ledger.exists(path):
         with open(path, "w") as fp:
             fp.write("[]")
 
@@ -96,14 +104,13 @@ print(f"[INFO] Using data directory: {DATA_DIR}")
 
 def get_all_investment_totals():
     """Ambil total semua investasi dari folder user aktif."""
-    path = os.path.join(get_user_dir(), "investment.json")
-    if not os.path.exists(path):
-        print("DEBUG: investment.json tidak ditemukan di", path)
+    user_dir = get_user_dir()
+    if not backend.exists(user_dir, "investment.json"):
+        print("DEBUG: investment.json tidak ditemukan di", user_dir)
         return {"crypto": 0, "gold": 0, "land": 0, "business": 0, "stock": 0}
 
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = backend.load(user_dir, "investment.json")
     except Exception as e:
         print("Gagal baca investment.json:", e)
         return {"crypto": 0, "gold": 0, "land": 0, "business": 0, "stock": 0}
@@ -133,53 +140,32 @@ def jfmt(v):
 
 def same_month(date_str):
     """Pastikan hanya ambil data bulan aktif (YYYY-MM)"""
-    if not date_str:
-        return False
-    try:
-        for fmt in ("%Y-%m-%d", "%Y-%m", "%d/%m/%Y"):
-            try:
-                d = datetime.datetime.strptime(date_str, fmt)
-                return d.strftime("%Y-%m") == current_month_label()
-            except ValueError:
-                continue
-        return False
-    except Exception:
-        return False
+    return month_of(date_str) == current_month_label()
 
 
 import calendar  # tambahkan sekali di bagian import atas
 
-def get_monthly_summary():
-    """Hitung total income, expense, dan investment per bulan tanpa double counting dan termasuk dana darurat"""
-    income = load_json("income.json")
-    cashflow = load_json("cashflow.json")
-
+def get_monthly_summary(cashflow_months=None):
+    """
+    Hitung total income, expense, dan investment per bulan tanpa double counting dan termasuk dana darurat.
+    cashflow_months: hasil monthly_totals("cashflow.json") kalau sudah dihitung pemanggil.
+    """
     monthly = {m: {"income": 0, "expense": 0, "investment": 0} for m in range(1, 13)}
 
+    # total per (bulan, type) dihitung backend (kolom NumPy / GROUP BY), di sini cukup
+    # dikelompokkan ke bulan kalender
     # === INCOME ===
-    for i in income:
-        try:
-            d = datetime.datetime.strptime(i.get("date", ""), "%Y-%m-%d")
-            monthly[d.month]["income"] += float(i.get("amount", 0))
-        except Exception:
-            continue
+    for label, totals in monthly_totals("income.json").items():
+        monthly[int(label[5:7])]["income"] += sum(totals.values())
 
     # === EXPENSE & INVESTMENT (termasuk dana darurat) ===
-    for c in cashflow:
-        try:
-            d = datetime.datetime.strptime(c.get("date", ""), "%Y-%m-%d")
-        except Exception:
-            continue
-
-        t = c.get("type")
-        cat = c.get("category", "").lower()
-        a = float(c.get("amount", 0))
-
-        if t == "expense":
-            monthly[d.month]["expense"] += a
-        elif t == "investment":
-            # semua investasi termasuk dana darurat
-            monthly[d.month]["investment"] += a
+    if cashflow_months is None:
+        cashflow_months = monthly_totals("cashflow.json")
+    for label, totals in cashflow_months.items():
+        m = int(label[5:7])
+        monthly[m]["expense"] += totals.get("expense", 0)
+        # semua investasi termasuk dana darurat
+        monthly[m]["investment"] += totals.get("investment", 0)
 
     # === OUTPUT ===
     labels = [calendar.month_abbr[m] for m in range(1, 13)]
@@ -233,16 +219,15 @@ def load_json(filename):
     path = os.path.join(user_dir, filename)
 
     # fallback ke DATA_DIR lama jika file belum ada di user_dir
-    if not os.path.exists(path):
-        global_path = os.path.join(DATA_DIR, filename)
-        if os.path.exists(global_path):
-            path = global_path
+    if not backend.exists(user_dir, filename):
+        if backend.exists(DATA_DIR, filename):
+            user_dir = DATA_DIR
+            path = os.path.join(DATA_DIR, filename)
         else:
             return []
 
     try:
-        with open(path, "r") as f:
-            return json.load(f)
+        return backend.load(user_dir, filename)
     except json.JSONDecodeError:
         print(f"[WARN] JSON rusak: {path}")
         return []
@@ -257,18 +242,42 @@ def save_json(filename, data):
     Semua struktur folder otomatis dibuat jika belum ada.
     """
     user_dir = get_user_dir()
-    path = os.path.join(user_dir, filename)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
 
     try:
-        with open(path, "w") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        path = backend.save(user_dir, filename, data)
         # debug info
         print(f"[SAVE] {filename} → {path}")
     except Exception as e:
         print(f"[ERROR] save_json({filename}):", e)
 
 
+def append_json(filename, entry):
+    """
+    Tambah 1 record ke file list JSON di folder user aktif.
+    File ledger (cashflow.json, income.json) cukup di-append 1 baris JSONL ke partisi bulannya.
+    """
+    try:
+        path = backend.append(get_user_dir(), filename, entry)
+        print(f"[APPEND] {filename} → {path}")
+    except Exception as e:
+        print(f"[ERROR] append_json({filename}):", e)
+
+
+def month_records(filename, month):
+    """Record file list (income/cashflow) untuk 1 bulan (YYYY-MM)"""
+    return backend.month_records(get_user_dir(), filename, month)
+
+
+def type_totals(filename, month=None):
+    """Total amount per type (income/expense/investment), opsional untuk 1 bulan"""
+    return backend.type_totals(get_user_dir(), filename, month)
+
+
+def monthly_totals(filename):
+    """{'YYYY-MM': {type: total}} untuk semua bulan di file list"""
+    return backend.monthly_totals(get_user_dir(), filename)
+
+
         
 # ---------- USER MANAGEMENT ----------
 USER_FILE = os.path.join(DATA_DIR, "users.json")
@@ -304,87 +313,110 @@ init_admin()
        
 # ---------- API FETCH ----------
 # ==========================================================
-# ===   CACHED API FETCH (15 MINUTES LIMIT)               ===
+# ===   PRICE SERVICE (paralel + stale-while-revalidate)  ===
 # ==========================================================
 
 # ----- CRYPTO -----
-@lru_cache(maxsize=1)
-def _cached_crypto_prices(ts: int):
-    """Cache daftar harga crypto IDR maksimal 1x tiap 15 menit"""
-    try:
-        ids = "bitcoin,ethereum,cardano,solana,polkadot,velo,sui,ethena,xrp,nervos-network,binancecoin,gatechain-token"
-        url = f"https://api.coingecko.com/api/v3/simple/price?ids={ids}&vs_currencies=idr"
-        r = requests.get(url, timeout=10).json()
-        return {
-            "BTC": r.get("bitcoin", {}).get("idr", 0),
-            "ETH": r.get("ethereum", {}).get("idr", 0),
-            "ADA": r.get("cardano", {}).get("idr", 0),
-            "SOL": r.get("solana", {}).get("idr", 0),
-            "DOT": r.get("polkadot", {}).get("idr", 0),
-            "VELO": r.get("velo", {}).get("idr", 0),
-            "SUI": r.get("sui", {}).get("idr", 0),
-            "ENA": r.get("ethena", {}).get("idr", 0),
-            "XRP": r.get("xrp", {}).get("idr", 0),
-            "CKB": r.get("nervos-network", {}).get("idr", 0),
-            "BNB": r.get("binancecoin", {}).get("idr", 0),
-            "GT":  r.get("gatechain-token", {}).get("idr", 0),
-        }
-    except Exception as e:
-        print("Crypto API Error:", e)
-        return {}
-
-def get_crypto_prices():
-    """Ambil daftar harga crypto IDR (cache 15 menit)"""
-    ts = int(time.time() // (15 * 60))
-    return _cached_crypto_prices(ts)
+def get_crypto_prices(symbols=None):
+    """
+    {SYMBOL: harga IDR} untuk coin yang dipegang user mana pun (atau `symbols`).
+    Harga terakhir, di-refresh di background; fetch di-batch per chunk id CoinGecko.
+    """
+    if symbols is None:
+        symbols = crypto_universe()
+    symbols = sorted({s.upper().strip() for s in symbols if s and s.strip()})
+    quotes = prices.service.get_many([prices.crypto_key(s) for s in symbols])
+    return {s: quotes[prices.crypto_key(s)] for s in symbols}
 
 
 def get_crypto_price(symbol: str):
-    """Ambil harga 1 coin tertentu IDR (pakai cache get_crypto_prices)"""
-    symbol = symbol.upper()
-    data = get_crypto_prices()
-    return data.get(symbol, 0)
+    """Ambil harga 1 coin tertentu IDR"""
+    return prices.service.get(prices.crypto_key(symbol))
 
 
 # ----- GOLD -----
-@lru_cache(maxsize=1)
-def _cached_gold_price(ts: int):
-    """Fallback harga emas via metals-api.com"""
-    try:
-        # ambil harga gold dari metals-api mirror
-        data = requests.get("https://metals-api.stream/api/v1/latest/XAU", timeout=10).json()
-        usd_per_ounce = float(data["price"])
-        usd_idr = 16000
-        per_gram = (usd_per_ounce * usd_idr) / 31.1035
-        return round(per_gram, 0)
-    except Exception as e:
-        print("Gold API fallback error:", e)
-        return 0
-
-
 def get_gold_price():
-    """Wrapper dengan blok waktu 15 menit agar tidak kena rate-limit"""
-    ts = int(time.time() // (15 * 60))
-    return _cached_gold_price(ts)
+    """Harga emas per gram IDR (harga terakhir, di-refresh di background)"""
+    return prices.service.get("gold")
 
 
 # ----- STOCK -----
-@lru_cache(maxsize=10)
-def _cached_stock_price(symbol: str, ts: int):
-    """Cache harga saham IDR via Yahoo Finance maksimal 1x tiap 15 menit per simbol"""
-    try:
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}.JK"
-        r = requests.get(url, timeout=5).json()
-        price = r["chart"]["result"][0]["meta"]["regularMarketPrice"]
-        return price
-    except Exception as e:
-        print(f"Stock API Error ({symbol}):", e)
-        return 0
-
 def get_stock_price(symbol: str):
-    """Harga saham IDR via Yahoo Finance (cache 15 menit per simbol)"""
-    ts = int(time.time() // (15 * 60))
-    return _cached_stock_price(symbol.upper(), ts)
+    """Harga saham IDR via Yahoo Finance (harga terakhir per simbol)"""
+    return prices.service.get(prices.stock_key(symbol))
+
+
+def get_stock_prices(symbols):
+    """{SYMBOL: harga per lembar} untuk banyak saham sekaligus (1 request batch)"""
+    symbols = sorted({s.upper().strip() for s in symbols if s and s.strip()})
+    quotes = prices.service.get_many([prices.stock_key(s) for s in symbols])
+    return {s: quotes[prices.stock_key(s)] for s in symbols}
+
+
+def user_dirs():
+    """Folder data global + folder semua user terdaftar"""
+    dirs = [DATA_DIR]
+    for u in load_users():
+        user_dir = os.path.join(DATA_DIR, u.get("username", ""))
+        if u.get("username") and os.path.isdir(user_dir):
+            dirs.append(user_dir)
+    return dirs
+
+
+_holdings_cache = {}  # user_dir -> (versi investment.json, {category: {SYMBOL}})
+
+
+def _user_holdings(user_dir):
+    """{category: set simbol} 1 user; investment.json hanya dibaca ulang kalau versinya berubah"""
+    version = backend.version(user_dir, "investment.json")
+    hit = _holdings_cache.get(user_dir)
+    if version is not None and hit is not None and hit[0] == version:
+        return hit[1]
+    data = []
+    if backend.exists(user_dir, "investment.json"):
+        try:
+            data = backend.load(user_dir, "investment.json")
+        except Exception:
+            data = []
+    holdings = {}
+    for x in (data if isinstance(data, list) else []):
+        if isinstance(x, dict):
+            symbol = (x.get("asset") or "").upper().strip()
+            if symbol:
+                holdings.setdefault(x.get("category"), set()).add(symbol)
+    if version is not None:  # None = ada perubahan yang belum di-flush, jangan di-cache
+        _holdings_cache[user_dir] = (version, holdings)
+    return holdings
+
+
+def held_symbols(category):
+    """
+    Semua simbol aset `category` yang dipegang user mana pun. Per user di-cache dengan
+    versi investment.json, jadi render dashboard cukup stat file, bukan parse semua JSON.
+    """
+    symbols = set()
+    for user_dir in user_dirs():
+        symbols |= _user_holdings(user_dir).get(category, set())
+    return symbols
+
+
+def stock_universe():
+    return held_symbols("stock")
+
+
+def crypto_universe():
+    return held_symbols("crypto")
+
+
+def get_market_prices():
+    """
+    Crypto & emas sekaligus (paralel): halaman cukup menunggu provider paling lambat.
+    Crypto yang diambil hanya union coin yang dipegang semua user.
+    """
+    symbols = sorted(crypto_universe())
+    keys = [prices.crypto_key(s) for s in symbols]
+    quotes = prices.service.get_many(keys + ["gold"])
+    return {s: quotes[k] for s, k in zip(symbols, keys)}, quotes["gold"]
 
 def rollover_buffer():
     """Tutup bulan berjalan: simpan laporan ke history dan reset income/expense."""
@@ -467,6 +499,17 @@ def restrict_access():
 
 
 # ---------- ROUTES ----------
+@app.route("/prices")
+@login_required
+def price_status():
+    """Harga terakhir yang diketahui beserta umurnya (detik) + state breaker & latency provider"""
+    return jsonify({
+        "status": "success",
+        "data": prices.service.quotes(),
+        "providers": price_http.status(),
+    })
+
+
 @app.route("/")
 def index():
     today = datetime.date.today()
@@ -474,25 +517,23 @@ def index():
 
     # === LOAD DATA ===
     income = load_json("income.json")
-    cashflow = load_json("cashflow.json")
     investment = load_json("investment.json")
     emergency = load_json("emergency.json")
     investment_reduce = load_json("investment_reduce.json")
     networth = load_json("networth.json")
 
-    crypto = get_crypto_prices()
-    gold = get_gold_price()
+    crypto, gold = get_market_prices()
 
     # === FILTER BULAN AKTIF ===
-    month_income = [i for i in income if same_month(i.get("date", ""))]
-    month_cashflow = [c for c in cashflow if same_month(c.get("date", ""))]
+    month_cashflow = month_records("cashflow.json", month_now)
 
     month_cashflow.sort(key=lambda x: x.get("date", ""), reverse=True)
 
     # === HITUNG TOTAL ===
-    total_income = sum(float(i.get("amount", 0)) for i in month_income)
-    total_expense = sum(float(c.get("amount", 0)) for c in month_cashflow if c.get("type") == "expense")
-    total_investment_savings = sum(float(c.get("amount", 0)) for c in month_cashflow if c.get("type") == "investment")
+    month_totals = type_totals("cashflow.json", month_now)
+    total_income = sum(type_totals("income.json", month_now).values())
+    total_expense = month_totals.get("expense", 0)
+    total_investment_savings = month_totals.get("investment", 0)
 
     # === BUFFER (saldo tersisa nyata) ===
     buffer_balance = total_income - (total_expense + total_investment_savings)
@@ -561,8 +602,10 @@ def index():
 
     # === MONTHLY HISTORY ===
     monthly_data = get_monthly_summary()
-    liabilities_path = os.path.join(get_user_dir(), "liabilities.json")
-    liabilities = load_json(liabilities_path) if os.path.exists(liabilities_path) else []
+    # paid / remaining / progress dihitung ulang dari cashflow (cache per versi data),
+    # jadi hapus/edit expense Loan langsung terlihat
+    from networth_integration_v46 import calculate_networth
+    liabilities = calculate_networth()["liabilities_detail"]
 
     # === RENDER TEMPLATE ===
     return render_template(
@@ -608,10 +651,14 @@ def investment_panel():
     emergency = load_json("emergency.json")  # 🟩 tambahan
 
     # ambil harga-harga realtime
-    crypto = get_crypto_prices()
-    gold_price = get_gold_price()
+    crypto, gold_price = get_market_prices()
     print("DEBUG GOLD PRICE =", gold_price)
 
+    # harga saham: semua simbol yang dipegang user mana pun diambil dalam 1 batch,
+    # sehingga cache berisi seluruh universe simbol dan tidak saling menggusur
+    held_stocks = {(x.get("asset") or "") for x in investment if x.get("category") == "stock"}
+    stock = get_stock_prices(stock_universe() | held_stocks)
+
     # --- total per kategori investasi utama ---
     inv_crypto = sum(x.get("current_value", x.get("amount_idr", 0))
                      for x in investment if x.get("category") == "crypto")
@@ -712,6 +759,7 @@ def investment_panel():
         investment_reduce=investment_reduce,
         crypto=crypto,
         gold=gold_price,
+        stock=stock,
         inv_crypto=inv_crypto,
         inv_gold=inv_gold,
         inv_land=inv_land,
@@ -750,18 +798,13 @@ def add_income():
     save_json("income.json", income)
 
     # 🟩 Tambahkan juga ke cashflow.json agar history sinkron
-    cash = load_json("cashflow.json")
-    if not isinstance(cash, list):
-        cash = []
-
-    cash.append({
+    append_json("cashflow.json", {
         "date": date,
         "type": "income",
         "category": stream,
         "amount": amount,
         "note": note
     })
-    save_json("cashflow.json", cash)
 
     flash(f"Pendapatan {stream} sebesar {fmt_idr(amount)} ditambahkan.", "success")
     return redirect(url_for("index"))
@@ -773,7 +816,6 @@ def add_expense():
     """Tambah pengeluaran baru (termasuk otomatis update pelunasan loan & Net Worth)."""
     try:
         expense = load_json("expense.json")
-        cash = load_json("cashflow.json")
 
         date = request.form.get("date", "")
         category = request.form.get("category", "").strip().title()
@@ -799,14 +841,13 @@ def add_expense():
         save_json("expense.json", expense)
 
         # === Catat ke cashflow.json ===
-        cash.append({
+        append_json("cashflow.json", {
             "date": date,
             "type": "expense",
             "category": category,
             "amount": amount,
             "note": note
         })
-        save_json("cashflow.json", cash)
 
         # === 1️⃣ Jika kategori Loan → kurangi liabilitas aktif ===
         if category.lower() == "loan":
@@ -839,17 +880,11 @@ def add_expense():
 
         # === 3️⃣ Simpan juga ke snapshot bulan aktif ===
         try:
-            today = datetime.date.today()
             month_label = current_month_label()
-            user_dir = get_user_dir()
-            history_dir = os.path.join(user_dir, "history")
-            os.makedirs(history_dir, exist_ok=True)
-            snapshot_path = os.path.join(history_dir, f"{month_label}.json")
-
-            if os.path.exists(snapshot_path):
-                with open(snapshot_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            else:
+            snapshot_name = os.path.join("history", f"{month_label}.json")
+
+            data = load_json(snapshot_name)
+            if not isinstance(data, dict):
                 data = {"month": month_label, "summary": {}, "entries": {}}
 
             # Tambahkan transaksi baru ke entries.expense
@@ -861,10 +896,8 @@ def add_expense():
             })
 
             # Perbarui summary networth
-            data["summary"]["networth"] = summary
-
-            with open(snapshot_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            data.setdefault("summary", {})["networth"] = summary
+            save_json(snapshot_name, data)
 
             print(f"[SNAPSHOT] Net Worth bulan {month_label} diperbarui setelah pengeluaran.")
         except Exception as e:
@@ -883,15 +916,13 @@ def add_expense():
 @app.route("/add_cashflow", methods=["POST"])
 @login_required
 def add_cashflow():
-    data = load_json("cashflow.json")
-    data.append({
+    append_json("cashflow.json", {
         "date": request.form["date"],
         "type": request.form["type"],
         "category": request.form["category"],
         "amount": float(request.form["amount"].replace(".", "")),
         "note": request.form.get("note", ""),
     })
-    save_json("cashflow.json", data)
     return redirect(url_for("index"))
 def add_invest_record(category, payload):
     """Tambahkan data investasi ke investment.json tanpa menambah ke cashflow"""
@@ -950,17 +981,13 @@ def add_invest():
         add_invest_record(cat, payload)
 
     # 🟩 catat ke cashflow agar muncul di summary
-    cash = load_json("cashflow.json")
-    if not isinstance(cash, list):
-        cash = []
-    cash.append({
+    append_json("cashflow.json", {
         "date": date,
         "type": "investment",
         "category": f"Investment {cat.capitalize()}",
         "amount": float(payload.get("amount_idr", 0)),
         "note": payload.get("note", "")
     })
-    save_json("cashflow.json", cash)
 
     return redirect(url_for("investment_panel"))
 
@@ -995,8 +1022,7 @@ def upload_investment_json():
         return redirect(url_for("investment_panel"))
 
     # Tulis langsung untuk uji pertama
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(new_data, f, indent=2)
+    backend.save(os.path.dirname(filepath), "investment.json", new_data, indent=2)
 
     flash("Data berhasil disimpan ke investment.json (tes awal)", "success")
 
@@ -1047,7 +1073,8 @@ def add_gold():
     amount_idr = float(request.form["amount_idr"])
     gram = amount_idr / entry_price if entry_price else 0
 
-    price_now = get_gold_price()
+    # belum ada quote valid → nilai di harga beli (bukan 0)
+    price_now = get_gold_price() or entry_price
     current_value = gram * price_now
     pnl = ((current_value - amount_idr) / amount_idr * 100) if amount_idr else 0
 
@@ -1071,7 +1098,7 @@ def add_stock():
     amount_idr = float(request.form["amount_idr"])
     lot = amount_idr / (entry_price * 100) if entry_price else 0
 
-    price_now = get_stock_price(sym)
+    price_now = get_stock_price(sym) or entry_price
     current_value = lot * price_now * 100
     pnl = ((current_value - amount_idr) / amount_idr * 100) if amount_idr else 0
 
@@ -1148,18 +1175,13 @@ def add_emergency():
     save_json("emergency.json", data)
 
     # catat ke cashflow juga
-    cash = load_json("cashflow.json")
-    if not isinstance(cash, list):        # ⬅️ tambahkan ini
-        cash = []
-
-    cash.append({
+    append_json("cashflow.json", {
         "date": request.form["date"],
         "type": "investment",
         "category": "Dana Darurat",
         "amount": float(request.form["amount"].replace(".", "")),
         "note": request.form.get("note", "")
     })
-    save_json("cashflow.json", cash)
 
     return redirect(url_for("index"))
 
@@ -1180,17 +1202,14 @@ def reduce_emergency():
     })
     save_json("emergency.json", data)
 
-    # Tambahkan otomatis ke cashflow.json
-    cash = load_json("cashflow.json")
-    cash.append({
+    # Tambahkan otomatis ke cashflow.json (urutan tampilan diurutkan di index)
+    append_json("cashflow.json", {
         "date": date,
         "type": "expense",
         "category": "Emergency Fund",
         "amount": amount,
         "note": note
     })
-    cash.sort(key=lambda x: x.get("date", ""), reverse=True)
-    save_json("cashflow.json", cash)
 
     print(f"[Emergency] Pengeluaran Rp {amount:,.0f} tercatat di dana darurat & cashflow")
     return redirect(url_for("index"))
@@ -1218,30 +1237,22 @@ def rekap_redirect():
 @app.route("/history")
 def history_panel():
     history_dir = os.path.join(get_user_dir(), "history")
-    files = sorted([f for f in os.listdir(history_dir) if f.endswith(".json")], reverse=True)
+    # daftar bulan cukup dari nama file snapshot, isinya tidak perlu dibaca
+    try:
+        files = [e.name for e in os.scandir(history_dir) if e.name.endswith(".json") and e.is_file()]
+    except FileNotFoundError:
+        files = []
     histories = []
 
-    for fname in files:
-        month = fname.replace(".json", "")
-        path = os.path.join(history_dir, fname)
-        with open(path, encoding="utf-8") as f:
-            _ = json.load(f)  # isi file hanya dipakai ambil bulan
-
-        cashflow = load_json("cashflow.json")
-
-        # Ambil data cashflow bulan ini
-        income_total = sum(
-            float(c.get("amount", 0))
-            for c in cashflow if c.get("type") == "income" and c.get("date", "").startswith(month)
-        )
-        expense_total = sum(
-            float(c.get("amount", 0))
-            for c in cashflow if c.get("type") == "expense" and c.get("date", "").startswith(month)
-        )
-        invest_total = sum(
-            float(c.get("amount", 0))
-            for c in cashflow if c.get("type") == "investment" and c.get("date", "").startswith(month)
-        )
+    # total cashflow semua bulan dalam 1 pass (group-by bulan)
+    cashflow_months = monthly_totals("cashflow.json")
+
+    for fname in sorted(files, reverse=True):
+        month = fname[:-len(".json")]
+        totals = cashflow_months.get(month, {})
+        income_total = totals.get("income", 0)
+        expense_total = totals.get("expense", 0)
+        invest_total = totals.get("investment", 0)
 
         buffer_real = income_total - (expense_total + invest_total)
 
@@ -1253,7 +1264,7 @@ def history_panel():
             "buffer": buffer_real
         })
 
-    monthly_data = get_monthly_summary()
+    monthly_data = get_monthly_summary(cashflow_months)
     return render_template("history.html", histories=histories, monthly=monthly_data)
 
 
@@ -1273,31 +1284,11 @@ def save_month_snapshot():
     month_label = current_month_label()
 
 
-    # === Ambil data utama ===
-    income = load_json("income.json")
-    cashflow = load_json("cashflow.json")
-
-    # --- Filter berdasarkan bulan aktif ---
-    def same_month(date_str):
-        """Pastikan hanya ambil data bulan aktif (YYYY-MM)"""
-        if not date_str:
-            return False
-        try:
-            for fmt in ("%Y-%m-%d", "%Y-%m", "%d/%m/%Y"):
-                try:
-                    d = datetime.datetime.strptime(date_str, fmt)
-                    return d.strftime("%Y-%m") == current_month_label()
-                except ValueError:
-                    continue
-            return False
-        except Exception:
-            return False
-
-
-    # --- Ambil data bulan ini ---
-    month_income = [i for i in income if same_month(i.get("date", ""))]
-    month_expense = [c for c in cashflow if c.get("type") == "expense" and same_month(c.get("date", ""))]
-    month_investment = [c for c in cashflow if c.get("type") == "investment" and same_month(c.get("date", ""))]
+    # === Ambil data bulan ini ===
+    month_income = month_records("income.json", month_label)
+    month_cashflow = month_records("cashflow.json", month_label)
+    month_expense = [c for c in month_cashflow if c.get("type") == "expense"]
+    month_investment = [c for c in month_cashflow if c.get("type") == "investment"]
 
     # --- Konversi struktur investment agar tampil rapi di tabel ---
     month_investment_fixed = []
@@ -1377,6 +1368,7 @@ def save_month_snapshot():
         with open(out_path, "w", encoding="utf-8") as f:
             json.dump(snapshot, f, indent=2, ensure_ascii=False)
         print(f"[Snapshot] {session.get('username')} → {out_path}")
+        report_cache.invalidate_month(get_user_dir(), month_label)
         flash(f"Snapshot bulan {month_label} tersimpan dengan benar.", "success")
     except Exception as e:
         print(f"[ERROR] Gagal menyimpan snapshot: {e}")
@@ -1400,19 +1392,10 @@ def history_detail(month):
     entries = data.get("entries", {})
 
     # === Ambil ulang dari cashflow ===
-    cash = load_json("cashflow.json")
-    income_total = sum(
-        float(c.get("amount", 0))
-        for c in cash if c.get("type") == "income" and c.get("date", "").startswith(month)
-    )
-    expense_total = sum(
-        float(c.get("amount", 0))
-        for c in cash if c.get("type") == "expense" and c.get("date", "").startswith(month)
-    )
-    invest_total = sum(
-        float(c.get("amount", 0))
-        for c in cash if c.get("type") == "investment" and c.get("date", "").startswith(month)
-    )
+    totals = type_totals("cashflow.json", month)
+    income_total = totals.get("income", 0)
+    expense_total = totals.get("expense", 0)
+    invest_total = totals.get("investment", 0)
 
     buffer_balance = income_total - (expense_total + invest_total)
 
@@ -1441,291 +1424,274 @@ def history_detail(month):
 
 
 
+def history_report(month, user_dir=None):
+    """
+    Input laporan PDF 1 bulan untuk user aktif (atau user_dir): dict (reports_dir, name,
+    key, data, nw_summary) atau None kalau snapshot bulan itu tidak ada.
+    """
+    user_dir = user_dir or get_user_dir()
+    path = os.path.join(user_dir, "history", f"{month}.json")
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    try:
+        from networth_integration_v46 import calculate_networth
+        nw_summary = calculate_networth(user_dir)
+    except Exception as e:
+        print("[PDF] Gagal menghitung Net Worth:", e)
+        nw_summary = None
+
+    return {
+        "reports_dir": os.path.join(user_dir, "reports"),
+        "name": report_cache.history_name(month),
+        "key": report_cache.report_key(raw, nw_summary),
+        "data": json.loads(raw),
+        "nw_summary": nw_summary,
+    }
+
+
+def send_report(pdf_path, meta):
+    """Kirim PDF dari cache dengan ETag / Last-Modified (revalidasi → 304)"""
+    response = send_file(pdf_path, as_attachment=True, etag=meta["key"],
+                         last_modified=meta["created"], conditional=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def stream_report(pdf_bytes, name, key):
+    """Kirim PDF langsung dari memori (Content-Length, ETag, Last-Modified)"""
+    response = app.response_class(pdf_bytes, mimetype="application/pdf")
+    response.headers["Content-Disposition"] = f'attachment; filename="{name}"'
+    response.set_etag(key)
+    response.last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @app.route("/history/<month>/pdf")
 def export_history_pdf(month):
     """
-    Ekspor laporan bulanan ke PDF gaya profesional (font Poppins + layout rapi).
-    Semua tabel seragam, warna pastel senada dashboard.
+    Ekspor laporan bulanan ke PDF. Hasil di-cache per hash (snapshot + net worth + versi
+    template); request ulang tanpa perubahan langsung dilayani (ETag / Last-Modified, 304).
+    PDF baru di-render ke memori dan hanya disimpan ke disk kalau cache menilainya layak.
     """
-    import os
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib import colors
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-
-    path = os.path.join(HISTORY_DIR, f"{month}.json")
-    if not os.path.exists(path):
+    report = history_report(month)
+    if report is None:
         return f"Data {month} tidak ditemukan", 404
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    reports_dir, filename, key = report["reports_dir"], report["name"], report["key"]
+    hit = report_cache.lookup(reports_dir, filename, key)
+    if hit is not None:
+        return send_report(*hit)
+    if request.if_none_match.contains(key):
+        # browser sudah punya versi ini (di-stream tanpa disimpan) → tidak perlu render ulang
+        response = app.response_class(status=304)
+        response.set_etag(key)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
 
-    summary = data.get("summary", {})
-    entries = data.get("entries", {})
+    try:
+        buf = io.BytesIO()
+        t0 = time.perf_counter()
+        report_engine.render_history(buf, month, report["data"], report["nw_summary"])
+        elapsed = time.perf_counter() - t0
+    except Exception as e:
+        print(f"[PDF ERROR] Gagal membuat PDF: {e}")
+        flash("Gagal menyimpan file PDF.", "danger")
+        return redirect(url_for("history_panel"))
+
+    pdf_bytes = buf.getvalue()
+    if report_cache.should_persist(month, elapsed):
+        hit = report_cache.store_bytes(reports_dir, filename, key, pdf_bytes)
+        print(f"[PDF] Laporan tersimpan: {hit[0]}")
+    else:
+        # versi lama bulan ini (kalau ada) sudah tidak cocok → jangan tinggalkan file basi
+        report_cache.invalidate(reports_dir, filename)
+    return stream_report(pdf_bytes, filename, key)
 
-        # === FONT POPPINS ===
-    base_font = "Helvetica"
 
-    # Coba prioritas Poppins-Light untuk efek tipis (setara font-weight 200)
-    light_candidates = [
-        "/usr/share/fonts/truetype/poppins/Poppins-Light.ttf",
-        "/Library/Fonts/Poppins-Light.ttf",
-    ]
+# ----- JOB PDF (process pool, lihat report_jobs.py) -----
+def _job_response(month, job, code=200):
+    job = {k: v for k, v in job.items() if k != "key"}
+    job["status_url"] = url_for("history_pdf_job_status", month=month, job_id=job["id"])
+    if job["status"] == "done":
+        job["download_url"] = url_for("history_pdf_job_download", month=month, job_id=job["id"])
+    return jsonify(job), code
 
-    regular_candidates = [
-        "/usr/share/fonts/truetype/poppins/Poppins-Regular.ttf",
-        "/Library/Fonts/Poppins-Regular.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-    ]
 
+@app.route("/history/<month>/pdf/jobs", methods=["POST"])
+@login_required
+def history_pdf_job_submit(month):
+    """Antrikan render PDF di background. Return 202 + id job (job identik digabung)."""
+    report = history_report(month)
+    if report is None:
+        return jsonify({"status": "error", "message": f"Data {month} tidak ditemukan"}), 404
     try:
-        # Coba daftarkan font tipis dulu
-        for fp in light_candidates:
-            if os.path.exists(fp):
-                pdfmetrics.registerFont(TTFont("PoppinsLight", fp))
-                base_font = "PoppinsLight"
-                break
-
-        # Jika belum ketemu font tipis, pakai Poppins-Regular
-        if base_font == "Helvetica":
-            for fp in regular_candidates:
-                if os.path.exists(fp):
-                    pdfmetrics.registerFont(TTFont("Poppins", fp))
-                    base_font = "Poppins"
-                    break
+        job = report_jobs.submit(report["reports_dir"], month, report["data"],
+                                 report["nw_summary"], report["key"])
+    except report_jobs.QueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    return _job_response(month, job, 200 if job["status"] == "done" else 202)
 
-    except Exception as e:
-        print(f"[FONT] Gagal memuat Poppins: {e}")
 
+@app.route("/history/<month>/pdf/jobs/<job_id>")
+@login_required
+def history_pdf_job_status(month, job_id):
+    job = report_jobs.status(os.path.join(get_user_dir(), "reports"), job_id)
+    if job is None or job.get("month") != month:
+        return jsonify({"status": "error", "message": "job tidak ditemukan"}), 404
+    return _job_response(month, job)
 
-    # === SETUP PDF ===
-    filename = f"history_{month}.pdf"
-    reports_dir = os.path.join(get_user_dir(), "reports")
-    os.makedirs(reports_dir, exist_ok=True)
-    pdf_path = os.path.join(reports_dir, filename)
-
-    doc = SimpleDocTemplate(
-        pdf_path,
-        pagesize=A4,
-        rightMargin=36,
-        leftMargin=36,
-        topMargin=40,
-        bottomMargin=40
-    )
 
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name="Header", fontName=base_font, fontSize=18,
-                              leading=24, textColor=colors.HexColor("#2F3E46"), spaceAfter=14))
-    styles.add(ParagraphStyle(name="SubHeader", fontName=base_font, fontSize=12,
-                              leading=16, textColor=colors.HexColor("#495057"), spaceAfter=8))
-    styles.add(ParagraphStyle(name="NormalText", fontName=base_font, fontSize=10,
-                          leading=14, textColor=colors.black))
+@app.route("/history/<month>/pdf/jobs/<job_id>/download")
+@login_required
+def history_pdf_job_download(month, job_id):
+    reports_dir = os.path.join(get_user_dir(), "reports")
+    job = report_jobs.status(reports_dir, job_id)
+    if job is None or job.get("month") != month:
+        return jsonify({"status": "error", "message": "job tidak ditemukan"}), 404
+    if job["status"] != "done":
+        return _job_response(month, job, 409)
+    hit = report_cache.lookup(reports_dir, job["name"], job["key"])
+    if hit is None:
+        # cache di-invalidate setelah status() dibaca (data user berubah)
+        return _job_response(month, dict(job, status="expired"), 409)
+    return send_report(*hit)
+
+
+# ----- LAPORAN TAHUNAN (massal, paralel di semua core) -----
+def _annual_plan(year, tasks, user_dir):
+    """
+    Kumpulkan laporan tahun `year` untuk 1 user. Bulan yang PDF-nya masih valid di
+    cache dilewati; yang perlu di-render ditambahkan ke tasks. Return info user.
+    """
+    history_dir = os.path.join(user_dir, "history")
+    months = sorted(
+        e.name[:-5] for e in os.scandir(history_dir)
+        if e.is_file() and e.name.startswith(f"{year}-") and e.name.endswith(".json")
+    ) if os.path.isdir(history_dir) else []
+
+    reports_dir = os.path.join(user_dir, "reports")
+    plan = {"user_dir": user_dir, "reports_dir": reports_dir, "months": [], "cached": 0,
+            "annual": None, "annual_key": None}
+    parts = []
+    for month in months:
+        report = history_report(month, user_dir)
+        plan["months"].append(report["name"])
+        parts.append((month, report["data"], report["nw_summary"], report["key"]))
+        if report_cache.lookup(reports_dir, report["name"], report["key"]) is not None:
+            plan["cached"] += 1
+        else:
+            tasks.append((reports_dir, report["name"], report["key"], report_jobs.render_to,
+                          (month, report["data"], report["nw_summary"])))
+    if parts:
+        name = report_cache.annual_name(year)
+        key = report_cache.report_key("annual", year, [p[3] for p in parts])
+        plan["annual"], plan["annual_key"] = name, key
+        if report_cache.lookup(reports_dir, name, key) is None:
+            tasks.append((reports_dir, name, key, report_jobs.render_annual_to,
+                          (year, [p[:3] for p in parts])))
+    return plan
+
+
+def _annual_zip(year, plan):
+    """Zip semua laporan bulanan + laporan gabungan di <user>/reports/annual_<year>.zip"""
+    import zipfile
+    reports_dir = plan["reports_dir"]
+    zip_path = os.path.join(reports_dir, report_cache.annual_name(year, "zip"))
+    names = [n for n in plan["months"] + ([plan["annual"]] if plan["annual"] else [])
+             if os.path.exists(os.path.join(reports_dir, n))]
+    # zip yang lebih baru dari semua PDF-nya tidak perlu dibuat ulang
+    if os.path.exists(zip_path) and all(
+            os.path.getmtime(os.path.join(reports_dir, n)) <= os.path.getmtime(zip_path) for n in names):
+        return zip_path
+    tmp = f"{zip_path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name in names:
+            zf.write(os.path.join(reports_dir, name), arcname=name)
+    os.replace(tmp, zip_path)
+    return zip_path
+
+
+def generate_annual_reports(year, usernames=None, make_zip=True, workers=None):
+    """
+    Laporan tahunan untuk banyak user: render semua bulan yang belum valid di cache
+    (plus laporan gabungan per user) dalam 1 process pool, lalu zip per user.
+    Return {username: plan}.
+    """
+    if usernames is None:
+        usernames = [u.get("username") for u in load_users() if u.get("username")]
+    plans, tasks = {}, []
+    for username in usernames:
+        plans[username] = _annual_plan(year, tasks, os.path.join(DATA_DIR, username))
 
+    t0 = time.perf_counter()
+    results = report_jobs.render_batch(tasks, workers=workers)
+    print(f"[PDF BATCH] {year}: {len(tasks)} laporan di-render dalam {time.perf_counter() - t0:.1f}s, "
+          f"{sum(p['cached'] for p in plans.values())} bulan dari cache")
 
-    elements = []
+    for username, plan in plans.items():
+        plan["failed"] = [name for (d, name), err in results.items() if d == plan["reports_dir"] and err]
+        if make_zip and plan["months"]:
+            plan["zip"] = _annual_zip(year, plan)
+    return plans
 
-    # === HEADER ===
-    elements.append(Paragraph("BUKABOX Financial Report", styles["Header"]))
-    elements.append(Paragraph(f"Periode: {month}", styles["SubHeader"]))
-    elements.append(Spacer(1, 10))
 
-    # === DONUT CHART ===
-    try:
-        from reportlab.graphics.shapes import Drawing
-        from reportlab.graphics.charts.piecharts import Pie
-
-        total_income = float(summary.get("income", 0) or 0)
-        total_expense = float(summary.get("expense", 0) or 0)
-        total_invest = float(summary.get("investment", 0) or 0)
-        total_buffer = abs(float(summary.get("buffer", 0) or 0))
-        total_all = total_income + total_expense + total_invest + total_buffer or 1
-
-        pie_vals = [
-            (total_income / total_all) * 100,
-            (total_expense / total_all) * 100,
-            (total_invest / total_all) * 100,
-            (total_buffer / total_all) * 100
-        ]
-        labels = ["Income", "Expense", "Investment", "Buffer"]
-
-        d = Drawing(260, 160)
-        pie = Pie()
-        pie.x = 65
-        pie.y = 15
-        pie.width = 130
-        pie.height = 130
-        pie.data = pie_vals
-        pie.labels = [f"{lbl} {val:.1f}%" for lbl, val in zip(labels, pie_vals)]
-        pie.sideLabels = True
-        pie.startAngle = 90
-        pie.slices.strokeWidth = 0.3
-        pie.slices.strokeColor = colors.white
-
-        pastel = [
-            colors.HexColor("#A5C8E4"),  # income
-            colors.HexColor("#F4C7B8"),  # expense
-            colors.HexColor("#B8E4C9"),  # invest
-            colors.HexColor("#EAD1DC"),  # buffer
-        ]
-        for i, c in enumerate(pastel):
-            pie.slices[i].fillColor = c
-
-        d.add(pie)
-        elements.append(d)
-        elements.append(Spacer(1, 20))
-    except Exception as e:
-        print(f"[PDF Chart] Gagal render donut: {e}")
-
-    # === TABEL RINGKASAN ===
-    elements.append(Paragraph("RINGKASAN KEUANGAN", styles["SubHeader"]))
-    summary_table = [
-        ["Income", f"Rp {total_income:,.0f}"],
-        ["Expense", f"Rp {total_expense:,.0f}"],
-        ["Investment", f"Rp {total_invest:,.0f}"],
-        ["Buffer", f"Rp {float(summary.get('buffer', 0) or 0):,.0f}"]
-    ]
-    t = Table(summary_table, colWidths=[250, 180])
-    t.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#CCCCCC")),
-        ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#F8F9FA")),
-        ("FONTNAME", (0, 0), (-1, -1), base_font),
-        ("FONTSIZE", (0, 0), (-1, -1), 10),
-        ("ALIGN", (1, 0), (-1, -1), "RIGHT")
-    ]))
-    elements.append(t)
-    elements.append(Spacer(1, 18))
-
-    # === FUNGSI PEMBANGUN TABEL ===
-    def make_table(title, headers, rows, widths):
-        elements.append(Paragraph(title.upper(), styles["SubHeader"]))
-        data = [headers] + rows
-        tbl = Table(data, colWidths=[500 / len(headers)] * len(headers))  # sejajarkan semua tabel
-        tbl.setStyle(TableStyle([
-            ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#D3D3D3")),
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E9ECEF")),
-            ("FONTNAME", (0, 0), (-1, -1), base_font),
-            ("FONTSIZE", (0, 0), (-1, -1), 9),
-            ("ALIGN", (2, 1), (2, -1), "RIGHT"),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-            ("TOPPADDING", (0, 0), (-1, -1), 4),
-        ]))
-        elements.append(tbl)
-        elements.append(Spacer(1, 16))
-
-    # === PENDAPATAN ===
-    if entries.get("income"):
-        rows = []
-        for i in entries["income"]:
-            rows.append([
-                i.get("date", ""),
-                i.get("stream", ""),
-                f"Rp {float(i.get('amount', 0) or 0):,.0f}",
-                i.get("note", "")
-            ])
-        make_table("Daftar Pendapatan", ["Tanggal", "Stream", "Jumlah", "Catatan"], rows, [90, 160, 100, 80])
-
-    # === PENGELUARAN ===
-    if entries.get("expense"):
-        rows = []
-        for e in entries["expense"]:
-            rows.append([
-                e.get("date", ""),
-                e.get("category", ""),
-                f"Rp {float(e.get('amount', 0) or 0):,.0f}",
-                e.get("note", "")
-            ])
-        make_table("Daftar Pengeluaran", ["Tanggal", "Kategori", "Jumlah", "Catatan"], rows, [90, 160, 100, 80])
-
-    # === INVESTASI ===
-    if entries.get("investment"):
-        rows = []
-        for inv in entries["investment"]:
-            rows.append([
-                inv.get("category", ""),
-                inv.get("asset", ""),
-                f"Rp {float(inv.get('amount_idr', inv.get('amount', 0) or 0)):,.0f}",
-                inv.get("note", "")
-            ])
-        make_table("Daftar Investasi", ["Kategori", "Aset", "Modal (Rp)", "Catatan"], rows, [110, 110, 100, 90])
-        # === NET WORTH SUMMARY ===
+@app.route("/reports/annual/<int:year>.zip")
+@login_required
+def annual_report_zip(year):
+    """
+    Zip laporan semua bulan tahun `year` + laporan gabungan (user aktif). Kalau semua PDF
+    sudah valid di cache, zip langsung dikirim; kalau belum, render diantrikan sebagai 1 job
+    di report_jobs (202 + status_url) dan URL ini dipanggil ulang setelah job selesai.
+    """
+    tasks = []
+    plan = _annual_plan(year, tasks, get_user_dir())
+    if not plan["months"]:
+        return f"Tidak ada snapshot untuk tahun {year}", 404
+    if not tasks:
+        return send_file(_annual_zip(year, plan), as_attachment=True, download_name=f"bukabox_{year}.zip")
     try:
-        from networth_integration_v46 import calculate_networth
-        nw_summary = calculate_networth()
-
-        elements.append(Spacer(1, 20))
-        elements.append(Paragraph("NET WORTH SUMMARY", styles["SubHeader"]))
-        elements.append(Spacer(1, 6))
-
-        data_networth = [
-            ["Investment", f"Rp {nw_summary['investment']:,.0f}"],
-            ["Emergency Fund", f"Rp {nw_summary['emergency']:,.0f}"],
-            ["Buffer (Cash)", f"Rp {nw_summary['buffer']:,.0f}"],
-            ["Total Assets", f"Rp {nw_summary['investment'] + nw_summary['emergency'] + nw_summary['buffer']:,.0f}"],
-            ["Liabilities", f"Rp {nw_summary['liabilities']:,.0f}"],
-            ["Net Worth", f"Rp {nw_summary['net_worth']:,.0f}"],
-        ]
-
-        t_networth = Table(data_networth, colWidths=[220, 180])
-        t_networth.setStyle(TableStyle([
-            ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#CCCCCC")),
-            ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#F8F9FA")),
-            ("FONTNAME", (0, 0), (-1, -1), base_font),
-            ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
-            ("FONTSIZE", (0, 0), (-1, -1), 10),
-        ]))
-        elements.append(t_networth)
-
-        # === DETAIL LIABILITIES ===
-        elements.append(Spacer(1, 18))
-        elements.append(Paragraph("LIABILITIES DETAIL", styles["SubHeader"]))
-        elements.append(Spacer(1, 6))
-
-        liabilities = nw_summary.get("liabilities_detail", [])
-
-        if liabilities:
-            liab_data = [["Date", "Category", "Amount", "Remaining", "Progress", "Note"]]
-            for l in liabilities:
-                liab_data.append([
-                    l.get("date", "-"),
-                    l.get("category", "-"),
-                    f"Rp {float(l.get('amount', 0)):,.0f}",
-                    f"Rp {float(l.get('remaining', 0)):,.0f}",
-                    f"{float(l.get('progress', 0)):,.1f}%",
-                    l.get("note", "-")
-                ])
-
-            t_liab = Table(liab_data, colWidths=[65, 70, 70, 70, 50, 100])
-            t_liab.setStyle(TableStyle([
-                ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#DDDDDD")),
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E9ECEF")),
-                ("FONTNAME", (0, 0), (-1, -1), base_font),
-                ("FONTSIZE", (0, 0), (-1, -1), 9),
-                ("ALIGN", (2, 1), (4, -1), "RIGHT"),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ]))
-            elements.append(t_liab)
-        else:
-            elements.append(Paragraph("Tidak ada data liabilitas aktif.", styles["NormalText"]))
+        job = report_jobs.submit_annual(plan["reports_dir"], year, tasks, plan["annual_key"])
+    except report_jobs.QueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    return _annual_job_response(year, job, 202)
 
-    except Exception as e:
-        print("[PDF] Gagal menambahkan Net Worth section:", e)
 
-    # === FOOTER ===
-    elements.append(Spacer(1, 30))
-    elements.append(Paragraph("<i>Generated automatically by Bukabox Financial Dashboard</i>", styles["NormalText"]))
+def _annual_job_response(year, job, code=200):
+    job = {k: v for k, v in job.items() if k != "key"}
+    job["status_url"] = url_for("annual_report_job_status", year=year, job_id=job["id"])
+    if job["status"] == "done":
+        job["download_url"] = url_for("annual_report_zip", year=year)
+    return jsonify(job), code
 
-    # === BUILD PDF ===
-    try:
-        doc.build(elements)
-        print(f"[PDF] Laporan tersimpan: {pdf_path}")
-        return send_file(pdf_path, as_attachment=True)
-    except Exception as e:
-        print(f"[PDF ERROR] Gagal membuat PDF: {e}")
-        flash("Gagal menyimpan file PDF.", "danger")
-        return redirect(url_for("history_panel"))
+
+@app.route("/reports/annual/<int:year>/jobs/<job_id>")
+@login_required
+def annual_report_job_status(year, job_id):
+    job = report_jobs.status(os.path.join(get_user_dir(), "reports"), job_id)
+    if job is None or job.get("year") != year:
+        return jsonify({"status": "error", "message": "job tidak ditemukan"}), 404
+    return _annual_job_response(year, job)
+
+
+@app.cli.command("annual-reports")
+@click.argument("year", type=int)
+@click.option("--user", "users", multiple=True, help="Hanya user ini (boleh berulang)")
+@click.option("--workers", type=int, default=None, help="Jumlah proses render (default: semua core)")
+@click.option("--no-zip", is_flag=True, help="Jangan buat zip per user")
+def annual_reports_command(year, users, workers, no_zip):
+    """Laporan PDF semua bulan + gabungan tahunan untuk semua user (flask --app main annual-reports 2025)"""
+    plans = generate_annual_reports(year, usernames=list(users) or None, make_zip=not no_zip, workers=workers)
+    for username, plan in plans.items():
+        print(f"[PDF BATCH] {username}: {len(plan['months'])} bulan, {plan['cached']} dari cache, "
+              f"gagal {len(plan['failed'])}" + (f" → {plan['zip']}" if plan.get("zip") else ""))
 
 
 @app.route("/save_history")
@@ -1903,15 +1869,13 @@ def reduce_invest():
     save_json("buffer.json", buffer_data)
 
     # === CATAT ARUS KE CASHFLOW (untuk tracking umum) ===
-    cash = load_json("cashflow.json")
-    cash.append({
+    append_json("cashflow.json", {
         "date": datetime.date.today().isoformat(),
         "type": "income",  # 🔄 ubah ke income agar seimbang
         "category": f"Rebalance {token_label}",
         "amount": total_ditarik,
         "note": note or f"Dana masuk dari {token_label}"
     })
-    save_json("cashflow.json", cash)
 
     # === CATAT KE INCOME.JSON UNTUK DASHBOARD ===
     income_data = load_json("income.json")
@@ -1967,7 +1931,7 @@ def login():
                 "emergency.json", "buffer.json", "investment_reduce.json"
             ]:
                 path = os.path.join(user_dir, f)
-                if not os.path.exists(path):
+                if not ledger.exists(path):
                     with open(path, "w") as fp:
                         fp.write("[]")
 
@@ -2043,6 +2007,33 @@ def register():
 
 
 
+# ---------- CLI ----------
+@app.cli.command("compact-ledger")
+def compact_ledger_command():
+    """Migrasi & rapikan partisi ledger semua user (flask --app main compact-ledger)"""
+    dirs = [DATA_DIR] + [os.path.join(DATA_DIR, d) for d in sorted(os.listdir(DATA_DIR))]
+    total = 0
+    for user_dir in dirs:
+        if os.path.isdir(user_dir):
+            for name in sorted(ledger.LEDGER_FILES):
+                total += ledger.compact(os.path.join(user_dir, name))
+    print(f"[LEDGER] Selesai, {total} partisi ditulis ulang")
+
+
+@app.cli.command("rebuild-aggregates")
+def rebuild_aggregates_command():
+    """Hitung ulang agregat per bulan dari ledger mentah (flask --app main rebuild-aggregates)"""
+    dirs = [DATA_DIR] + [os.path.join(DATA_DIR, d) for d in sorted(os.listdir(DATA_DIR))]
+    total = 0
+    for user_dir in dirs:
+        if os.path.isdir(user_dir) and (
+            any(ledger.exists(os.path.join(user_dir, name)) for name in ledger.LEDGER_FILES)
+            or os.path.exists(os.path.join(user_dir, "bukabox.db"))
+        ):
+            total += backend.rebuild_aggregates(user_dir)
+    print(f"[AGGREGATES] Selesai, {total} bulan dihitung ulang ({backend.name})")
+
+
 # ---------- RUN ----------
 if __name__ == "__main__":
     port = 8124
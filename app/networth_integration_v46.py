@@ -2,25 +2,57 @@
 # Integrasi sistem Net Worth berdasarkan file main.py v4.6
 # Fokus: menggabungkan semua sumber aset (investment, emergency, buffer) menjadi 1 ringkasan nilai kekayaan bersih (Net Worth)
 
-import os, json, datetime
+import os, json, datetime, threading
 from flask import Blueprint, jsonify, render_template, request, flash, url_for, redirect
-from helpers import load_json, save_json, get_user_dir
+from helpers import load_json, save_json, append_json, get_user_dir, type_totals, loan_payments, data_version
+from doc_cache import clone
+import valuation
+from price_history import valid_month
+import report_cache
 
 
 
 networth_bp = Blueprint('networth', __name__)
 
+# === CACHE HASIL NET WORTH ===
+# calculate_networth() murni baca; hasilnya di-cache per user dengan key versi
+# file sumbernya, jadi request berulang tanpa perubahan data cukup 1 lookup dict.
+NETWORTH_SOURCES = ("investment.json", "emergency.json", "cashflow.json", "liabilities.json")
+_networth_cache = {}
+_networth_lock = threading.Lock()
+
+
+def calculate_networth(user_dir=None):
+    """
+    Hitung total kekayaan bersih user (aset, liabilitas, buffer, emergency, investment).
+    Hasil di-cache per versi data; liabilities.json hanya ditulis kalau paid / remaining /
+    progress / status salah satu loan berubah (index.html membaca nilai itu dari file).
+    user_dir diisi untuk menghitung user tertentu di luar request (batch laporan).
+    """
+    key = data_version(*NETWORTH_SOURCES, user_dir=user_dir)
+    if key is not None:
+        with _networth_lock:
+            hit = _networth_cache.get(key[0])
+        if hit is not None and hit[0] == key:
+            return clone(hit[1])
+
+    breakdown, loans_changed = _compute_networth(user_dir)
+    if loans_changed:
+        # progress loan berubah (mis. expense Loan dihapus/diedit) → simpan; versi liabilities ikut berubah
+        save_json("liabilities.json", breakdown["liabilities_detail"], user_dir=user_dir)
+    elif key is not None:
+        with _networth_lock:
+            _networth_cache[key[0]] = (key, clone(breakdown))
+    return breakdown
 
-def calculate_networth():
-    """Hitung total kekayaan bersih user (aset, liabilitas, buffer, emergency, investment)"""
-    user_dir = get_user_dir()
 
+def _compute_networth(user_dir=None):
+    """Hitungan net worth tanpa efek samping. Return (breakdown, loans_changed)."""
     # === MUAT SEMUA DATA ===
-    investment_data = load_json("investment.json")
-    emergency_data = load_json("emergency.json")
-    cashflow = load_json("cashflow.json")
-    liabilities_path = os.path.join(user_dir, "liabilities.json")
-    liabilities = load_json(liabilities_path) if os.path.exists(liabilities_path) else []
+    investment_data = load_json("investment.json", user_dir)
+    emergency_data = load_json("emergency.json", user_dir)
+    # salinan per item: data hasil load bisa dipakai ulang (memo per request)
+    liabilities = [dict(l) for l in load_json("liabilities.json", user_dir) if isinstance(l, dict)]
 
     # === 1️⃣ HITUNG ASET ===
     total_investment = sum(float(i.get("amount_idr", 0)) for i in investment_data)
@@ -28,64 +60,40 @@ def calculate_networth():
     total_assets_invest = total_investment + total_emergency
 
     # === 2️⃣ HITUNG BUFFER (saldo kas akhir) ===
-    total_income = sum(float(c.get("amount", 0)) for c in cashflow if c.get("type") == "income")
-    total_expense = sum(float(c.get("amount", 0)) for c in cashflow if c.get("type") == "expense")
-    total_investment_flow = sum(float(c.get("amount", 0)) for c in cashflow if c.get("type") == "investment")
+    totals = type_totals("cashflow.json", user_dir=user_dir)
+    total_income = totals.get("income", 0)
+    total_expense = totals.get("expense", 0)
+    total_investment_flow = totals.get("investment", 0)
 
     buffer = total_income - (total_expense + total_investment_flow)
 
     # === 3️⃣ HITUNG DETAIL & PROGRESS PER-LOAN (AMAN) ===
-    cashflow_path = os.path.join(user_dir, "cashflow.json")
-    cashflow_data = load_json(cashflow_path)
-
+    # Pembayaran = expense kategori Loan dengan note = ID liabilitas, diambil dari
+    # indeks {ID: total dibayar} yang dirawat saat tulis → O(liabilitas)
+    paid_index = loan_payments(user_dir)
+    loans_changed = False
     for l in liabilities:
         # selalu definisikan ID untuk menghindari NameError
         l_id = l.get("id", l.get("note", "")) or ""
-        total_paid = sum(
-            float(c.get("amount", 0))
-            for c in cashflow_data
-            if c.get("type") == "expense"  # ✅ hanya hitung pembayaran
-            and c.get("category", "").lower() == "loan"
-            and c.get("note", "") == l_id
-        )
+        total_paid = paid_index.get(l_id.strip(), 0)
 
         total_amount = float(l.get("amount", 0))
         remaining = max(total_amount - total_paid, 0)
         progress = round((total_paid / total_amount) * 100, 1) if total_amount > 0 else 0
 
-        l["paid"] = total_paid
-        l["remaining"] = remaining
-        l["progress"] = progress
-
         # Auto flag status
-        l["status"] = "Lunas" if remaining <= 0 else "Berjalan"
+        status = "Lunas" if remaining <= 0 else "Berjalan"
+
+        computed = {"paid": total_paid, "remaining": remaining, "progress": progress, "status": status}
+        loans_changed = loans_changed or any(l.get(k) != v for k, v in computed.items())
+        l.update(computed)
 
     # total liabilitas dihitung dari sisa (remaining)
     total_liabilities = sum(float(l.get("remaining", 0)) for l in liabilities)
 
-    # === Update status liabilitas berdasarkan pembayaran di cashflow ===
-    for l in liabilities:
-        l_id = l.get("id", "").strip()
-        total_paid = sum(
-            float(c.get("amount", 0))
-            for c in cashflow
-            if c.get("type") == "expense"
-            and c.get("category", "").lower() == "loan"
-            and c.get("note", "").strip() == l_id
-        )
-        amount = float(l.get("amount", 0))
-        remaining = max(amount - total_paid, 0)
-        progress = round((total_paid / amount) * 100, 1) if amount else 0
-
-        l["remaining"] = remaining
-        l["progress"] = progress
-        l["status"] = "Lunas" if remaining <= 0 else "Berjalan"
-
-
     # === 4️⃣ HITUNG NET WORTH ===
     total_assets = buffer + total_assets_invest
     net_worth = total_assets - total_liabilities
-    save_json(os.path.join(user_dir, "liabilities.json"), liabilities)
 
     # === 5️⃣ SUSUN HASIL ===
     breakdown = {
@@ -97,7 +105,18 @@ def calculate_networth():
         "net_worth": round(net_worth, 2)
     }
 
-    return breakdown
+    return breakdown, loans_changed
+
+
+def _save_networth(summary):
+    """Tulis networth.json hanya kalau isinya berubah (timestamp diabaikan)"""
+    current = load_json("networth.json")
+    if isinstance(current, dict):
+        strip = lambda d: {k: v for k, v in d.items() if k != "timestamp"}
+        if strip(current) == strip(summary):
+            return False
+    save_json("networth.json", summary)
+    return True
 
 
 @networth_bp.route('/networth', methods=['GET'])
@@ -107,10 +126,8 @@ def networth_summary():
         summary = calculate_networth()
         summary["timestamp"] = datetime.datetime.now().isoformat()
 
-        # Simpan snapshot ke file
-        user_dir = get_user_dir()
-        file_path = os.path.join(user_dir, "networth.json")
-        save_json("networth.json", summary)
+        # Simpan snapshot ke file (hanya kalau ada perubahan)
+        _save_networth(summary)
         save_networth_snapshot()
         return jsonify({"status": "success", "data": summary}), 200
 
@@ -134,18 +151,12 @@ def save_networth_snapshot():
         today = datetime.date.today()
         month_label = today.strftime('%Y-%m')
 
-        user_dir = get_user_dir()
-        history_dir = os.path.join(user_dir, "history")
-        os.makedirs(history_dir, exist_ok=True)
-
         # File snapshot utama bulan berjalan
-        main_path = os.path.join(history_dir, f"{month_label}.json")
+        snapshot_name = os.path.join("history", f"{month_label}.json")
 
         # Jika file sudah ada → load & update
-        if os.path.exists(main_path):
-            with open(main_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        else:
+        data = load_json(snapshot_name)
+        if not isinstance(data, dict):
             # Jika belum ada, buat template baru
             data = {
                 "month": month_label,
@@ -153,12 +164,12 @@ def save_networth_snapshot():
                 "entries": {}
             }
 
-        # Update bagian Net Worth
-        data["summary"]["networth"] = snapshot
-
-        # Simpan kembali ke file utama
-        with open(main_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Update bagian Net Worth; file hanya ditulis ulang kalau nilainya berubah
+        if data.setdefault("summary", {}).get("networth") != snapshot:
+            data["summary"]["networth"] = snapshot
+            # Simpan kembali ke file utama (di-flush di akhir request)
+            save_json(snapshot_name, data)
+            report_cache.invalidate_month(get_user_dir(), month_label)
 
         return jsonify({
             "status": "success",
@@ -179,7 +190,7 @@ def networth_dashboard():
 
         # Simpan file networth.json (opsional, update terakhir)
         user_dir = get_user_dir()
-        save_json(os.path.join(user_dir, "networth.json"), summary)
+        _save_networth(summary)
 
         # Ambil direktori history user
         history_dir = os.path.join(user_dir, "history")
@@ -226,6 +237,15 @@ def networth_dashboard():
 
         # Urutkan data berdasarkan bulan
         networth_history.sort(key=lambda x: x["month"])
+
+        # Nilai pasar investasi di akhir tiap bulan (dari price history lokal, tanpa API)
+        # (snapshot dengan label bulan rusak dilewati, tidak menggagalkan halaman)
+        market = valuation.month_end_values(load_json("investment.json"),
+                                            [h["month"] for h in networth_history if valid_month(h["month"])])
+        for h in networth_history:
+            if h["month"] in market:
+                h["investment_market"] = market[h["month"]]["value"]
+                h["investment_pnl"] = market[h["month"]]["pnl"]
         print("DEBUG NETWORTH HISTORY:", networth_history)
 
         # Render halaman dashboard Net Worth
@@ -246,6 +266,29 @@ def networth_dashboard():
         )
 
 
+@networth_bp.route('/networth/valuation')
+def networth_valuation():
+    """
+    Valuasi akhir bulan portofolio dari price history lokal.
+    ?months=2025-01,2025-02 (default: semua bulan sejak investasi pertama s/d bulan ini)
+    """
+    investment = load_json("investment.json")
+    months = [m.strip() for m in (request.args.get("months") or "").split(",") if m.strip()]
+    if not all(valid_month(m) for m in months):
+        return jsonify({"status": "error", "message": "format bulan harus YYYY-MM"}), 400
+    if not months:
+        dates = sorted(d for d in ((i.get("date") or "")[:7] for i in investment if isinstance(i, dict))
+                       if valid_month(d))
+        today = datetime.date.today()
+        if dates:
+            year, mon = map(int, dates[0].split("-"))
+            while (year, mon) <= (today.year, today.month):
+                months.append(f"{year}-{mon:02d}")
+                year, mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    values = valuation.month_end_values(investment, months)
+    return jsonify({"status": "success", "data": values})
+
+
 @networth_bp.route('/add_liability', methods=['POST'])
 def add_liability():
     """Tambah data liabilitas baru dengan ID unik, dan catat otomatis ke income serta cashflow (loan inflow)."""
@@ -292,8 +335,6 @@ def add_liability():
 
         # === 2️⃣ Catat otomatis sebagai pemasukan (Loan Inflow) ===
         try:
-            income_path = os.path.join(user_dir, "income.json")
-            incomes = load_json(income_path)
             new_income = {
                 "date": date,
                 "category": "Loan",
@@ -301,16 +342,13 @@ def add_liability():
                 "note": new_id,
                 "stream": name
             }
-            incomes.append(new_income)
-            save_json(income_path, incomes)
+            append_json("income.json", new_income)
             print(f"[INCOME] Dana pinjaman {new_id} dicatat di income.json: Rp{amount:,.0f}")
         except Exception as e:
             print("[LIABILITIES->INCOME ERROR]", e)
 
         # === 3️⃣ Tambahkan juga ke cashflow.json agar buffer ikut naik ===
         try:
-            cashflow_path = os.path.join(user_dir, "cashflow.json")
-            cashflows = load_json(cashflow_path)
             new_cashflow = {
                 "date": date,
                 "type": "income",
@@ -318,8 +356,7 @@ def add_liability():
                 "amount": amount,
                 "note": new_id,
             }
-            cashflows.append(new_cashflow)
-            save_json(cashflow_path, cashflows)
+            append_json("cashflow.json", new_cashflow)
             print(f"[CASHFLOW] Dana loan {new_id} masuk ke cashflow.json: Rp{amount:,.0f}")
         except Exception as e:
             print("[LIABILITIES->CASHFLOW ERROR]", e)
@@ -336,20 +373,14 @@ def add_liability():
         try:
             today = datetime.date.today()
             month_label = today.strftime("%Y-%m")
-            history_dir = os.path.join(user_dir, "history")
-            os.makedirs(history_dir, exist_ok=True)
-            main_snapshot_path = os.path.join(history_dir, f"{month_label}.json")
-
-            if os.path.exists(main_snapshot_path):
-                with open(main_snapshot_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            else:
-                data = {"month": month_label, "summary": {}, "entries": {}}
+            snapshot_name = os.path.join("history", f"{month_label}.json")
 
-            data["summary"]["networth"] = summary
+            data = load_json(snapshot_name)
+            if not isinstance(data, dict):
+                data = {"month": month_label, "summary": {}, "entries": {}}
 
-            with open(main_snapshot_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            data.setdefault("summary", {})["networth"] = summary
+            save_json(snapshot_name, data)
 
             print(f"[SNAPSHOT] Net Worth bulan {month_label} diperbarui.")
         except Exception as e:
@@ -0,0 +1,118 @@
+# === PRICE TIME-SERIES STORE (append-only, lokal) ===
+# Setiap quote sukses dari PriceService dicatat ke 1 file biner per key:
+#   <DATA_DIR>/price_history/<key>.bin   → record tetap 16 byte: (epoch float64, harga float64)
+# File hanya di-append (O_APPEND, 1 write per record) sehingga aman untuk banyak worker.
+# Pembacaan memuat file sebagai array NumPy (di-cache per signature file) dan lookup
+# "harga per tanggal X" memakai binary search (np.searchsorted), tanpa akses jaringan.
+# Observasi dengan harga sama dalam MIN_INTERVAL detik tidak ditulis ulang (file tetap kecil).
+
+import os, re, struct, threading, datetime
+import numpy as np
+from doc_cache import file_signature
+
+
+RECORD = struct.Struct("<dd")
+DTYPE = np.dtype([("t", "<f8"), ("v", "<f8")])
+MIN_INTERVAL = 3600
+
+
+MONTH_RE = re.compile(r"^(\d{4})-(\d{2})$")
+
+
+def valid_month(month):
+    """True untuk label 'YYYY-MM' dengan bulan 01..12"""
+    m = MONTH_RE.match(month) if isinstance(month, str) else None
+    return bool(m) and 1 <= int(m.group(2)) <= 12
+
+
+def month_end(month):
+    """'YYYY-MM' → epoch detik terakhir bulan itu (waktu lokal). ValueError kalau format salah."""
+    if not valid_month(month):
+        raise ValueError(f"bulan tidak valid: {month!r}")
+    year, mon = map(int, month.split("-"))
+    nxt = datetime.datetime(year + mon // 12, mon % 12 + 1, 1)
+    return nxt.timestamp() - 1
+
+
+class PriceHistory:
+    """Deret waktu harga per key quote ("gold", "crypto:BTC", "stock:BBCA")."""
+
+    def __init__(self, root):
+        self.root = root
+        self._last = {}    # key -> (t, v) terakhir yang ditulis proses ini
+        self._arrays = {}  # key -> (signature, times, values)
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9_.-]", "_", key) + ".bin")
+
+    def _tail(self, key):
+        """Record terakhir di file (atau None)"""
+        try:
+            with open(self.path(key), "rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell() - f.tell() % RECORD.size
+                if size == 0:
+                    return None
+                f.seek(size - RECORD.size)
+                return RECORD.unpack(f.read(RECORD.size))
+        except OSError:
+            return None
+
+    # --- tulis ---
+    def record(self, key, value, ts):
+        """Catat 1 observasi harga (nilai bukan angka / <= 0 diabaikan)"""
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        if value <= 0:
+            return False
+        with self._lock:
+            last = self._last.get(key) or self._tail(key)
+            if last is not None and last[1] == value and ts - last[0] < MIN_INTERVAL:
+                return False
+            os.makedirs(self.root, exist_ok=True)
+            fd = os.open(self.path(key), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, RECORD.pack(ts, value))
+            finally:
+                os.close(fd)
+            self._last[key] = (ts, value)
+        return True
+
+    # --- baca ---
+    def _load(self, key):
+        """(times, values) terurut waktu; di-cache selama file tidak berubah"""
+        path = self.path(key)
+        try:
+            sig = file_signature(path)
+        except OSError:
+            return np.empty(0), np.empty(0)
+        with self._lock:
+            hit = self._arrays.get(key)
+        if hit is not None and hit[0] == sig:
+            return hit[1], hit[2]
+        raw = np.fromfile(path, dtype=DTYPE, count=sig[1] // DTYPE.itemsize)
+        # append dari beberapa worker bisa sedikit tidak urut
+        order = np.argsort(raw["t"], kind="stable")
+        times, values = raw["t"][order], raw["v"][order]
+        with self._lock:
+            self._arrays[key] = (sig, times, values)
+        return times, values
+
+    def as_of(self, key, ts):
+        """Harga terakhir yang tercatat pada/sebelum ts (atau None)"""
+        times, values = self._load(key)
+        i = int(np.searchsorted(times, ts, side="right"))
+        return float(values[i - 1]) if i else None
+
+    def at_month_end(self, key, month):
+        return self.as_of(key, month_end(month))
+
+    def series(self, key, start=None, end=None):
+        """[(epoch, harga)] dalam rentang [start, end]"""
+        times, values = self._load(key)
+        lo = int(np.searchsorted(times, start, side="left")) if start is not None else 0
+        hi = int(np.searchsorted(times, end, side="right")) if end is not None else len(times)
+        return list(zip(times[lo:hi].tolist(), values[lo:hi].tolist()))
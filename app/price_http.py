@@ -0,0 +1,248 @@
+# === HTTP CLIENT PROVIDER HARGA ===
+# 1 requests.Session bersama (keep-alive + connection pool) untuk semua provider, dengan:
+#   - retry terbatas + backoff eksponensial ber-jitter (hanya error jaringan / 5xx / 429)
+#   - circuit breaker per provider: setelah BREAKER_FAILURES gagal beruntun, provider
+#     di-"open" selama BREAKER_RESET detik dan panggilan langsung gagal (fail fast) →
+#     PriceService tetap menyajikan harga terakhir dari cache
+#   - statistik latency & state breaker untuk monitoring (status(), lihat GET /prices)
+#   - transport bisa diganti adapter record/replay (price_replay.py, BUKABOX_PRICE_MODE)
+#   - hedged(): 1 quote dari beberapa sumber; sumber berikutnya baru dikirim kalau yang
+#     sebelumnya belum menjawab dalam HEDGE_DELAY detik (atau sudah gagal). Jawaban valid
+#     pertama menang, sisanya dibatalkan (yang belum jalan di-cancel, yang sedang jalan
+#     hasilnya dibuang).
+
+import os, time, random, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+import price_replay
+
+
+RETRIES = int(os.getenv("BUKABOX_PRICE_RETRIES", "2"))
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2.0
+BREAKER_FAILURES = 5
+BREAKER_RESET = 60
+POOL_SIZE = 16
+HEDGE_DELAY = float(os.getenv("BUKABOX_PRICE_HEDGE_DELAY", "0.5"))
+
+
+class CircuitOpen(Exception):
+    """Provider sedang di-skip karena circuit breaker terbuka"""
+
+
+class RetryableStatus(Exception):
+    pass
+
+
+class HedgeFailed(Exception):
+    """Tidak ada sumber yang memberi jawaban valid; `partials` = jawaban tidak lengkap"""
+
+    def __init__(self, message, partials=()):
+        super().__init__(message)
+        self.partials = list(partials)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session():
+    """Session bersama (dibuat sekali per proses)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = (price_replay.adapter_from_env(POOL_SIZE)
+                           or HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE))
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                s.headers["User-Agent"] = "bukabox/1.0"
+                _session = s
+    return _session
+
+
+def install(adapter):
+    """Ganti transport Session bersama (mis. price_replay.ReplayAdapter di benchmark/test)"""
+    s = session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return adapter
+
+
+class CircuitBreaker:
+    """closed → (gagal beruntun) → open → (lewat BREAKER_RESET) → half_open → 1 percobaan"""
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset=BREAKER_RESET):
+        self.name = name
+        self.threshold = failures
+        self.reset = reset
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.time() - self.opened_at >= self.reset:
+                self.state, self._trial = "half_open", False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state, self.failures, self.opened_at = "closed", 0, None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    print(f"[PRICE] Circuit breaker {self.name} terbuka setelah {self.failures} kegagalan")
+                self.state, self.opened_at = "open", time.time()
+
+
+class ProviderClient:
+    """Client HTTP 1 provider: session bersama, retry + backoff, breaker & statistik latency."""
+
+    def __init__(self, name, retries=RETRIES):
+        self.name = name
+        self.retries = retries
+        self.breaker = CircuitBreaker(name)
+        self.calls = 0
+        self.errors = 0
+        self.last_latency = None
+        self.avg_latency = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def _record(self, latency, error=None):
+        with self._lock:
+            self.calls += 1
+            self.last_latency = latency
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+            if error is not None:
+                self.errors += 1
+                self.last_error = str(error)
+
+    def get_json(self, url, params=None, timeout=10):
+        """GET → JSON. Total waktu (termasuk retry) dibatasi `timeout` detik."""
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{self.name}: circuit breaker open")
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                r = session().get(url, params=params, timeout=max(deadline - start, 0.1))
+                if r.status_code == 429 or r.status_code >= 500:
+                    raise RetryableStatus(f"HTTP {r.status_code}")
+                r.raise_for_status()
+                data = r.json()
+            except (requests.ConnectionError, requests.Timeout, RetryableStatus) as e:
+                self._record(time.monotonic() - start, e)
+                # full jitter: acak 0..min(max, base * 2^attempt)
+                backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                if attempt >= self.retries or time.monotonic() + backoff >= deadline:
+                    self.breaker.failure()
+                    raise
+                attempt += 1
+                time.sleep(backoff)
+                continue
+            except Exception as e:
+                self._record(time.monotonic() - start, e)
+                self.breaker.failure()
+                raise
+            self._record(time.monotonic() - start)
+            self.breaker.success()
+            return data
+
+    def status(self):
+        with self._lock:
+            return {
+                "breaker": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+                "calls": self.calls,
+                "errors": self.errors,
+                "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+                "avg_latency_ms": round(self.avg_latency * 1000, 1) if self.avg_latency is not None else None,
+                "last_error": self.last_error,
+            }
+
+
+_clients = {}
+
+
+def client(name):
+    """ProviderClient per nama provider (coingecko, metals, yahoo, ...)"""
+    if name not in _clients:
+        with _session_lock:
+            _clients.setdefault(name, ProviderClient(name))
+    return _clients[name]
+
+
+def status():
+    """State breaker & latency semua provider (untuk monitoring)"""
+    return {name: c.status() for name, c in sorted(_clients.items())}
+
+
+# === HEDGED REQUEST ===
+_hedge_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="price-hedge")
+
+
+def _guarded(cancelled, fn):
+    if cancelled.is_set():
+        raise HedgeFailed("dibatalkan")
+    return fn()
+
+
+def positive(value):
+    return isinstance(value, (int, float)) and value > 0
+
+
+def hedged(sources, valid=positive, delay=None):
+    """
+    sources = [(nama, fungsi tanpa argumen)] urut prioritas. Return jawaban valid pertama.
+    Jawaban yang tidak valid tapi tidak kosong (mis. batch parsial) dikumpulkan di
+    HedgeFailed.partials kalau semua sumber gagal.
+    """
+    delay = HEDGE_DELAY if delay is None else delay
+    cancelled = threading.Event()
+    queue = list(sources)
+    pending, errors, partials = {}, [], []
+
+    def launch():
+        if queue:
+            name, fn = queue.pop(0)
+            pending[_hedge_pool.submit(_guarded, cancelled, fn)] = name
+
+    launch()
+    while pending:
+        done, _ = wait(list(pending), timeout=delay if queue else None, return_when=FIRST_COMPLETED)
+        if not done:
+            launch()  # sumber sebelumnya lambat → hedge ke sumber berikutnya
+            continue
+        for future in done:
+            name = pending.pop(future)
+            try:
+                value = future.result()
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                launch()
+                continue
+            if valid(value):
+                cancelled.set()
+                for other in pending:
+                    other.cancel()
+                return value
+            if value:
+                partials.append(value)
+            errors.append(f"{name}: respons tidak valid")
+            launch()
+    raise HedgeFailed("; ".join(errors) or "tidak ada sumber", partials)
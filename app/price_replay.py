@@ -0,0 +1,140 @@
+# === RECORD & REPLAY PROVIDER HARGA (offline benchmark / CI) ===
+# Transport adapter in-process yang dipasang di Session bersama price_http, jadi semua
+# provider (CoinGecko, CryptoCompare, metals-api, Yahoo, FX, ...) ikut tanpa perubahan kode.
+#   BUKABOX_PRICE_MODE=live     (default) request sungguhan
+#   BUKABOX_PRICE_MODE=record   request sungguhan, respons disimpan ke file fixture
+#   BUKABOX_PRICE_MODE=replay   tidak ada akses jaringan; respons dibaca dari fixture
+# Opsi replay:
+#   BUKABOX_PRICE_FIXTURES=path.json     (default <repo>/benchmarks/fixtures/prices.json)
+#   BUKABOX_PRICE_LATENCY=50 | 20-200    latency buatan per request (ms, tetap / acak rentang)
+#   BUKABOX_PRICE_FAILURE_RATE=0.1       peluang request gagal (ConnectionError)
+#   BUKABOX_PRICE_SEED=42                seed RNG supaya latency & kegagalan deterministik
+# Fixture: {"GET https://host/path?a=1&b=2": {"status": 200, "json": {...}}}; query diurutkan.
+# Kalau URL persis tidak ada, dipakai fixture pertama dengan host+path yang sama.
+
+import os, json, time, random, threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+
+DEFAULT_FIXTURES = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures", "prices.json"))
+
+
+def fixture_key(method, url):
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}" + (f"?{query}" if query else "")
+
+
+def _base(key):
+    return key.split("?", 1)[0]
+
+
+def _latency(spec):
+    """'50' → (0.05, 0.05); '20-200' → (0.02, 0.2)"""
+    lo, _, hi = (spec or "0").partition("-")
+    return float(lo) / 1000, float(hi or lo) / 1000
+
+
+def _load(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class ReplayAdapter(BaseAdapter):
+    """Jawab request dari fixture, dengan latency & kegagalan buatan."""
+
+    def __init__(self, fixtures, latency=(0, 0), failure_rate=0.0, seed=None):
+        super().__init__()
+        self.fixtures = fixtures
+        self.by_path = {}
+        for key, value in fixtures.items():
+            self.by_path.setdefault(_base(key), value)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.misses = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, request, timeout=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            delay = self._rng.uniform(*self.latency)
+            fail = self._rng.random() < self.failure_rate
+        if isinstance(timeout, tuple):
+            timeout = timeout[-1]
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise requests.Timeout(f"replay: latency {delay:.3f}s > timeout", request=request)
+        time.sleep(delay)
+        if fail:
+            raise requests.ConnectionError("replay: kegagalan buatan", request=request)
+
+        key = fixture_key(request.method, request.url)
+        fixture = self.fixtures.get(key) or self.by_path.get(_base(key))
+        response = requests.Response()
+        response.request, response.url = request, request.url
+        response.headers["Content-Type"] = "application/json"
+        if fixture is None:
+            with self._lock:
+                self.misses += 1
+            response.status_code = 404
+            response._content = json.dumps({"error": f"tidak ada fixture untuk {key}"}).encode()
+        else:
+            response.status_code = fixture.get("status", 200)
+            response._content = json.dumps(fixture.get("json")).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter biasa yang menyimpan setiap respons JSON ke file fixture."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.fixtures = _load(path)
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            return response
+        with self._lock:
+            self.fixtures[fixture_key(request.method, request.url)] = {"status": response.status_code, "json": body}
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.fixtures, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        return response
+
+
+def adapter_from_env(pool_size):
+    """Adapter sesuai BUKABOX_PRICE_MODE, atau None untuk mode live"""
+    mode = os.getenv("BUKABOX_PRICE_MODE", "live")
+    path = os.getenv("BUKABOX_PRICE_FIXTURES", DEFAULT_FIXTURES)
+    if mode == "record":
+        print(f"[PRICE] Mode record → {path}")
+        return RecordingAdapter(path, pool_connections=pool_size, pool_maxsize=pool_size)
+    if mode == "replay":
+        seed = os.getenv("BUKABOX_PRICE_SEED")
+        adapter = ReplayAdapter(
+            _load(path),
+            latency=_latency(os.getenv("BUKABOX_PRICE_LATENCY")),
+            failure_rate=float(os.getenv("BUKABOX_PRICE_FAILURE_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+        print(f"[PRICE] Mode replay ← {path} ({len(adapter.fixtures)} fixture)")
+        return adapter
+    return None
@@ -0,0 +1,115 @@
+# === SHARED PRICE CACHE (SQLite, lintas worker gunicorn) ===
+# Quote terakhir disimpan di 1 file SQLite (WAL) yang dipakai bersama semua worker:
+#   quotes(key, value, fetched_at, expires_at, failed_at, error, lease_until, lease_owner)
+# Sebelum fetch ke upstream, worker mengambil "lease" untuk key itu dalam transaksi
+# BEGIN IMMEDIATE. Kalau worker lain baru saja fetch (atau sedang memegang lease),
+# hasilnya dipakai ulang, jadi N worker tetap 1 fetch upstream per interval.
+# Isi cache dibaca saat startup sehingga restart/deploy langsung punya harga terakhir.
+
+import os, json, sqlite3, threading, time
+
+
+class SharedPriceStore:
+    """Cache quote lintas proses dengan metadata TTL dan lease fetch."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def owner(self):
+        return str(os.getpid())
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quotes ("
+                "key TEXT PRIMARY KEY, value TEXT, fetched_at REAL, expires_at REAL, "
+                "failed_at REAL, error TEXT, lease_until REAL, lease_owner TEXT)"
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _quote(row):
+        value, fetched_at, failed_at, error = row
+        return {
+            "value": json.loads(value) if value is not None else None,
+            "fetched_at": fetched_at,
+            "failed_at": failed_at,
+            "error": error,
+        }
+
+    def load_all(self):
+        """Semua quote tersimpan {key: quote} (warm-up saat startup)"""
+        rows = self._conn().execute("SELECT key, value, fetched_at, failed_at, error FROM quotes")
+        return {key: self._quote(rest) for key, *rest in rows}
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, fetched_at, failed_at, error FROM quotes WHERE key = ?", (key,)
+        ).fetchone()
+        return self._quote(row) if row else None
+
+    def claim(self, key, fresh_after, retry_after, lease_seconds):
+        """
+        Ambil lease fetch untuk key. Return (status, quote):
+          ("fetch", None)    → worker ini yang fetch ke upstream
+          ("fresh", quote)   → quote di disk cukup baru (fetched >= fresh_after, atau
+                               gagal >= retry_after), pakai saja
+          ("leased", quote)  → worker lain sedang fetch
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, fetched_at, failed_at, error, lease_until, lease_owner "
+                "FROM quotes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                quote = self._quote(row[:4])
+                if (quote["fetched_at"] or 0) >= fresh_after or (quote["failed_at"] or 0) >= retry_after:
+                    conn.execute("COMMIT")
+                    return "fresh", quote
+                if (row[4] or 0) > now and row[5] != self.owner:
+                    conn.execute("COMMIT")
+                    return "leased", quote
+            conn.execute(
+                "INSERT INTO quotes (key, lease_until, lease_owner) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET lease_until = excluded.lease_until, "
+                "lease_owner = excluded.lease_owner",
+                (key, now + lease_seconds, self.owner),
+            )
+            conn.execute("COMMIT")
+            return "fetch", None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def put(self, key, quote, ttl):
+        """
+        Simpan hasil fetch (atomic) dan lepas lease. Fetch yang gagal (error terisi) hanya
+        mencatat failed_at/error; harga & fetched_at terakhir di store tidak ditimpa.
+        """
+        fetched_at = quote.get("fetched_at")
+        if quote.get("error") is None:
+            update = ("value = excluded.value, fetched_at = excluded.fetched_at, "
+                      "expires_at = excluded.expires_at, failed_at = excluded.failed_at, error = excluded.error")
+        else:
+            update = ("value = COALESCE(quotes.value, excluded.value), "
+                      "fetched_at = COALESCE(quotes.fetched_at, excluded.fetched_at), "
+                      "expires_at = COALESCE(quotes.expires_at, excluded.expires_at), "
+                      "failed_at = excluded.failed_at, error = excluded.error")
+        self._conn().execute(
+            "INSERT INTO quotes (key, value, fetched_at, expires_at, failed_at, error, lease_until, lease_owner) "
+            "VALUES (?, ?, ?, ?, ?, ?, NULL, NULL) "
+            f"ON CONFLICT (key) DO UPDATE SET {update}, lease_until = NULL, lease_owner = NULL",
+            (key, json.dumps(quote.get("value")) if fetched_at else None, fetched_at,
+             fetched_at + ttl if fetched_at else None, quote.get("failed_at"), quote.get("error")),
+        )
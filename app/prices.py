@@ -0,0 +1,638 @@
+# === PRICE SERVICE (crypto, emas, saham) ===
+# Semua quote yang dibutuhkan 1 halaman diambil paralel (thread pool), masing-masing
+# dengan deadline per provider. Provider yang lewat deadline tidak menahan halaman:
+# hasilnya parsial (nilai default) dan fetch tetap jalan di background.
+#
+# Stale-while-revalidate: setiap quote disimpan bersama waktu fetch-nya. Request selalu
+# dilayani harga terakhir yang diketahui (plus umurnya); thread refresher memperbarui
+# quote yang pernah diminta sebelum umurnya lewat REFRESH_SECONDS. Upstream down atau
+# quote yang basi tidak pernah menambah latency request (kecuali cold start pertama).
+#
+# Dengan shared store (price_store.py, SQLite) quote dibagi ke semua worker gunicorn dan
+# bertahan saat restart: lihat PriceService.attach().
+#
+# Key quote:  "crypto:BTC"    → harga 1 coin (IDR)
+#             "gold"          → harga emas per gram (IDR)
+#             "stock:BBCA"    → harga saham IDX per lembar (IDR)
+#             "fx:USDIDR"     → kurs 1 USD dalam IDR (dipakai konversi harga emas)
+# DEPENDS: key yang provider-nya membaca quote lain (gold → fx:USDIDR). Dependensi ikut
+# diminta & di-refresh dari thread peminta, provider hanya membacanya lewat peek() —
+# tidak ada submit bersarang ke pool yang sama dari dalam thread pool.
+# Provider batch (saham, crypto): semua key yang perlu di-fetch bersamaan digabung jadi
+# request multi-simbol per chunk, jadi yang diambil hanya simbol yang benar-benar dipegang.
+# Ticker crypto dipetakan ke id CoinGecko lewat crypto_registry (persisten di DATA_DIR).
+# Setiap quote sukses juga dicatat ke price_history (deret waktu lokal untuk valuasi historis).
+
+import os, time, threading
+from price_store import SharedPriceStore
+from crypto_registry import SymbolRegistry
+from price_history import PriceHistory
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError, wait
+import price_http
+
+
+CACHE_SECONDS = 15 * 60                                             # quote dianggap basi
+REFRESH_SECONDS = int(os.getenv("BUKABOX_PRICE_REFRESH", str(12 * 60)))  # refresh sebelum basi
+RETRY_SECONDS = 60        # jeda retry provider yang gagal
+IDLE_SECONDS = 24 * 3600  # quote yang tidak diminta selama ini berhenti di-refresh
+TICK_SECONDS = 15
+MAX_WORKERS = int(os.getenv("BUKABOX_PRICE_WORKERS", "8"))
+REFRESHER = os.getenv("BUKABOX_PRICE_REFRESHER", "1") != "0"
+
+# deadline (detik) per provider; juga dipakai sebagai timeout HTTP
+DEADLINES = {"crypto": 10, "gold": 10, "stock": 5, "fx": 5}
+STOCK_BATCH_SIZE = 50
+STOCK_FALLBACK_WORKERS = 4  # request chart paralel untuk simbol yang tidak ada di respons batch
+CRYPTO_BATCH_SIZE = 100
+CRYPTO_COMPARE_BATCH_SIZE = 50
+YAHOO_HOSTS = ("query1", "query2")
+# kurs cadangan kalau provider FX belum pernah berhasil dan belum ada series historis
+FX_FALLBACK = {"USDIDR": float(os.getenv("BUKABOX_USD_IDR", "16000"))}
+
+registry = SymbolRegistry()  # diganti versi persisten oleh init_store()
+history = None               # PriceHistory, diaktifkan oleh init_store()
+
+
+# --- provider ---
+# Tiap kelas aset punya beberapa sumber; price_http.hedged() mengirim ke sumber berikutnya
+# kalau yang pertama lambat/gagal dan memakai jawaban valid pertama. Harga <= 0 tidak
+# pernah dianggap valid, jadi tidak ada valuasi nol dari upstream yang error.
+OUNCE_GRAMS = 31.1035
+
+
+def _covers(symbols):
+    """Validator batch: semua simbol ada dengan harga > 0"""
+    return lambda got: all(price_http.positive(got.get(s)) for s in symbols)
+
+
+def _merge_partials(error):
+    out = {}
+    for part in reversed(error.partials):
+        out.update({k: v for k, v in part.items() if price_http.positive(v)})
+    return out
+
+
+def _coingecko(symbols):
+    """Harga IDR via CoinGecko simple/price (ticker → id lewat registry), per CRYPTO_BATCH_SIZE id"""
+    ids = registry.provider_ids(symbols)
+    by_id = {}
+    for sym, cg_id in ids.items():
+        by_id.setdefault(cg_id, []).append(sym)
+    cg_ids = sorted(by_id)
+    prices = {}
+    for i in range(0, len(cg_ids), CRYPTO_BATCH_SIZE):
+        chunk = cg_ids[i:i + CRYPTO_BATCH_SIZE]
+        r = price_http.client("coingecko").get_json(
+            "https://api.coingecko.com/api/v3/simple/price",
+            params={"ids": ",".join(chunk), "vs_currencies": "idr"}, timeout=DEADLINES["crypto"],
+        )
+        for cg_id in chunk:
+            price = r.get(cg_id, {}).get("idr")
+            if price:
+                for sym in by_id[cg_id]:
+                    prices[sym] = price
+    return prices
+
+
+def _cryptocompare(symbols):
+    """Harga IDR via CryptoCompare pricemulti (langsung pakai ticker)"""
+    prices = {}
+    for i in range(0, len(symbols), CRYPTO_COMPARE_BATCH_SIZE):
+        chunk = symbols[i:i + CRYPTO_COMPARE_BATCH_SIZE]
+        r = price_http.client("cryptocompare").get_json(
+            "https://min-api.cryptocompare.com/data/pricemulti",
+            params={"fsyms": ",".join(chunk), "tsyms": "IDR"}, timeout=DEADLINES["crypto"],
+        )
+        for sym in chunk:
+            price = (r.get(sym) or {}).get("IDR")
+            if price:
+                prices[sym] = price
+    return prices
+
+
+def fetch_cryptos(symbols):
+    """Harga IDR banyak coin (hedged CoinGecko → CryptoCompare)"""
+    symbols = sorted({s.upper().strip() for s in symbols})
+    try:
+        return price_http.hedged([
+            ("coingecko", lambda: _coingecko(symbols)),
+            ("cryptocompare", lambda: _cryptocompare(symbols)),
+        ], valid=_covers(symbols))
+    except price_http.HedgeFailed as e:
+        prices = _merge_partials(e)
+        if not prices:
+            raise
+        return prices
+
+
+def fetch_crypto(symbol):
+    """Harga IDR 1 coin"""
+    return fetch_cryptos([symbol]).get(symbol.upper().strip(), 0)
+
+
+def _gold_metals_api(usd_idr):
+    data = price_http.client("metals").get_json("https://metals-api.stream/api/v1/latest/XAU",
+                                                timeout=DEADLINES["gold"])
+    return round(float(data["price"]) * usd_idr / OUNCE_GRAMS, 0)
+
+
+def _gold_api(usd_idr):
+    data = price_http.client("gold-api").get_json("https://api.gold-api.com/price/XAU",
+                                                  timeout=DEADLINES["gold"])
+    return round(float(data["price"]) * usd_idr / OUNCE_GRAMS, 0)
+
+
+def _gold_goldprice():
+    """Sudah dalam IDR per troy ounce (tanpa konversi kurs)"""
+    data = price_http.client("goldprice").get_json("https://data-asg.goldprice.org/dbXRates/IDR",
+                                                   timeout=DEADLINES["gold"])
+    return round(float(data["items"][0]["xauPrice"]) / OUNCE_GRAMS, 0)
+
+
+def fetch_gold():
+    """Harga emas per gram IDR (hedged metals-api → gold-api → goldprice.org)"""
+    usd_idr = fx_rate("USDIDR")
+    return price_http.hedged([
+        ("metals", lambda: _gold_metals_api(usd_idr)),
+        ("gold-api", lambda: _gold_api(usd_idr)),
+        ("goldprice", _gold_goldprice),
+    ])
+
+
+def _yahoo_chart(host, symbol):
+    url = f"https://{host}.finance.yahoo.com/v8/finance/chart/{symbol}.JK"
+    r = price_http.client(host).get_json(url, timeout=DEADLINES["stock"])
+    return r["chart"]["result"][0]["meta"]["regularMarketPrice"]
+
+
+def _yahoo_quote(host, symbols):
+    r = price_http.client(host).get_json(
+        f"https://{host}.finance.yahoo.com/v7/finance/quote",
+        params={"symbols": ",".join(f"{s}.JK" for s in symbols)}, timeout=DEADLINES["stock"],
+    )
+    prices = {}
+    for q in r["quoteResponse"]["result"]:
+        sym = q.get("symbol", "").upper().removesuffix(".JK")
+        if q.get("regularMarketPrice"):
+            prices[sym] = q["regularMarketPrice"]
+    return prices
+
+
+def fetch_stock(symbol):
+    """Harga 1 saham IDX via Yahoo Finance chart (hedged query1 → query2)"""
+    return price_http.hedged([(host, lambda h=host: _yahoo_chart(h, symbol)) for host in YAHOO_HOSTS])
+
+
+_stock_pool = ThreadPoolExecutor(max_workers=STOCK_FALLBACK_WORKERS, thread_name_prefix="price-stock")
+
+
+def fetch_stocks(symbols):
+    """
+    Harga banyak saham IDX sekaligus: 1 request quote per STOCK_BATCH_SIZE simbol (hedged
+    antar host Yahoo). Simbol yang tidak ada di respons batch dicoba lewat endpoint chart
+    (maks. STOCK_FALLBACK_WORKERS paralel, 1 deadline bersama); yang belum selesai saat
+    deadline menunggu refresh berikutnya.
+    """
+    prices = {}
+    for i in range(0, len(symbols), STOCK_BATCH_SIZE):
+        chunk = symbols[i:i + STOCK_BATCH_SIZE]
+        try:
+            prices.update(price_http.hedged(
+                [(host, lambda h=host: _yahoo_quote(h, chunk)) for host in YAHOO_HOSTS],
+                valid=_covers(chunk),
+            ))
+        except price_http.HedgeFailed as e:
+            prices.update(_merge_partials(e))
+            print(f"Stock API Error (batch {len(chunk)} simbol):", e)
+    missing = {_stock_pool.submit(fetch_stock, sym): sym for sym in symbols if sym not in prices}
+    if not missing:
+        return prices
+    done, late = wait(missing, timeout=DEADLINES["stock"])
+    for future in late:
+        future.cancel()
+    for future, sym in missing.items():
+        if future not in done:
+            continue
+        try:
+            prices[sym] = future.result()
+        except Exception as e:
+            print(f"Stock API Error ({sym}):", e)
+    if late:
+        print(f"Stock API Error: {len(late)} simbol lewat deadline, dicoba lagi di refresh berikutnya")
+    return prices
+
+
+def fetch_fx(pair):
+    """Kurs pasangan 'USDIDR' (1 USD dalam IDR) via open.er-api.com"""
+    base, quote = pair[:3], pair[3:]
+    r = price_http.client("fx").get_json(f"https://open.er-api.com/v6/latest/{base}", timeout=DEADLINES["fx"])
+    return float(r["rates"][quote])
+
+
+PROVIDERS = {"crypto": fetch_crypto, "gold": fetch_gold, "stock": fetch_stock, "fx": fetch_fx}
+# provider yang bisa mengambil banyak argumen dalam 1 panggilan: list arg → {arg: nilai}
+BATCH_PROVIDERS = {"stock": fetch_stocks, "crypto": fetch_cryptos}
+
+# key → quote yang dibaca provider-nya (lewat fx_rate / service.peek)
+DEPENDS = {"gold": ("fx:USDIDR",)}
+
+ERROR_LABELS = {
+    "crypto": "Crypto API Error", "gold": "Gold API fallback error", "stock": "Stock API Error",
+    "fx": "FX API Error",
+}
+
+
+def _default(provider):
+    """Nilai kalau quote gagal / lewat deadline (sama seperti perilaku lama)"""
+    return 0
+
+
+def _split(key):
+    """'stock:BBCA' → ('stock', ['BBCA'])"""
+    provider, _, arg = key.partition(":")
+    return provider, ([arg] if arg else [])
+
+
+def _valid(key):
+    """Key yang dikenal provider (key lama "crypto" berisi dict dari versi sebelumnya diabaikan)"""
+    provider, args = _split(key)
+    return provider in PROVIDERS and (bool(args) or provider not in BATCH_PROVIDERS)
+
+
+def stock_key(symbol):
+    return f"stock:{symbol.upper().strip()}"
+
+
+def crypto_key(symbol):
+    return f"crypto:{symbol.upper().strip()}"
+
+
+def fx_key(pair):
+    return f"fx:{pair.upper()}"
+
+
+class PriceService:
+    """Quote terakhir per key + fetch paralel (deadline per provider) + refresher background."""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.store = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="price")
+        self._quotes = {}     # key -> {"value", "fetched_at", "failed_at", "error"}
+        self._inflight = {}   # key -> Future (1 fetch per key walau diminta banyak request)
+        self._requested = {}  # key -> terakhir diminta (untuk refresher)
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def attach(self, store):
+        """Pakai shared store lintas worker; quote yang tersimpan langsung dimuat (warm-up)"""
+        self.store = store
+        try:
+            saved = store.load_all()
+        except Exception as e:
+            print("[PRICE] Gagal baca shared cache:", e)
+            return
+        with self._lock:
+            for key, quote in saved.items():
+                if quote["value"] is not None and _valid(key):
+                    self._adopt(key, quote)
+        print(f"[PRICE] Shared cache {store.path}: {len(saved)} quote dimuat")
+
+    def _adopt(self, key, quote):
+        """
+        Gabungkan quote dari worker lain. Harga diambil dari quote dengan fetched_at terbaru
+        (quote tanpa fetched_at tidak pernah menimpa harga yang ada); status gagal
+        (failed_at/error) diambil kalau lebih baru. Panggil dengan _lock dipegang.
+        """
+        current = dict(self._quotes.get(key) or {
+            "value": _default(_split(key)[0]), "fetched_at": None, "failed_at": None, "error": None,
+        })
+        if quote.get("fetched_at") and quote["value"] is not None \
+                and quote["fetched_at"] >= (current["fetched_at"] or 0):
+            current.update(value=quote["value"], fetched_at=quote["fetched_at"], failed_at=None, error=None)
+        failed_at = quote.get("failed_at")
+        if failed_at and failed_at > max(current["fetched_at"] or 0, current.get("failed_at") or 0):
+            current.update(failed_at=failed_at, error=quote.get("error"))
+        self._quotes[key] = current
+        return current["value"]
+
+    def _claim(self, key, provider):
+        """Status shared store untuk key: ("fetch"|"fresh"|"leased", quote)"""
+        now = time.time()
+        try:
+            return self.store.claim(key, now - REFRESH_SECONDS, now - RETRY_SECONDS,
+                                    DEADLINES.get(provider, 5) + 5)
+        except Exception as e:
+            print("[PRICE] Shared cache error:", e)
+            return "fetch", None
+
+    def _await_shared(self, key, provider, since):
+        """Worker lain sedang fetch key ini: tunggu hasilnya di store (maks. deadline provider)"""
+        until = time.monotonic() + DEADLINES.get(provider, 5)
+        while time.monotonic() < until:
+            time.sleep(0.2)
+            try:
+                latest = self.store.get(key)
+            except Exception as e:
+                print("[PRICE] Shared cache error:", e)
+                return None
+            if latest and max(latest["fetched_at"] or 0, latest["failed_at"] or 0) >= since:
+                return latest
+        return None
+
+    # --- fetch ---
+    def _call(self, provider, keys):
+        """Panggil upstream. Return {key: (nilai, error)}"""
+        args = [_split(k)[1] for k in keys]
+        label = ERROR_LABELS.get(provider, "Price API Error")
+        if provider in BATCH_PROVIDERS:
+            try:
+                got = BATCH_PROVIDERS[provider]([a[0] for a in args])
+            except Exception as e:
+                print(f"{label} (batch):", e)
+                return {k: (None, str(e)) for k in keys}
+            return {
+                k: (got[a[0]], None) if got.get(a[0]) else (None, "tidak ada di respons")
+                for k, a in zip(keys, args)
+            }
+        out = {}
+        for key, a in zip(keys, args):
+            try:
+                value = PROVIDERS[provider](*a)
+                if not price_http.positive(value):
+                    raise ValueError(f"harga tidak valid: {value!r}")
+                out[key] = (value, None)
+            except Exception as e:
+                print(f"{label} ({a[0]}):" if a else f"{label}:", e)
+                out[key] = (None, str(e))
+        return out
+
+    def _run(self, provider, keys):
+        """Ambil quote untuk keys (1 provider). Return {key: nilai}"""
+        try:
+            return self._fetch(provider, keys)
+        finally:
+            # selalu dilepas, walau _fetch raise: kalau tertinggal, _submit berikutnya
+            # memakai ulang future yang gagal dan harga tidak pernah di-refresh lagi
+            with self._lock:
+                for key in keys:
+                    self._inflight.pop(key, None)
+
+    def _fetch(self, provider, keys):
+        started = time.time()
+        results, mine, leased = {}, list(keys), []
+        if self.store is not None:
+            mine = []
+            for key in keys:
+                status, quote = self._claim(key, provider)
+                if status == "fresh":
+                    with self._lock:
+                        results[key] = self._adopt(key, quote)
+                else:
+                    (mine if status == "fetch" else leased).append(key)
+
+        saved = {}
+        for key, (value, error) in (self._call(provider, mine) if mine else {}).items():
+            now = time.time()
+            with self._lock:
+                quote = self._quotes.setdefault(key, {"value": _default(provider), "fetched_at": None})
+                if error is None:
+                    quote.update(value=value, fetched_at=now, failed_at=None, error=None)
+                else:
+                    # upstream gagal: harga terakhir tetap dipakai, coba lagi setelah RETRY_SECONDS
+                    quote.update(failed_at=now, error=error)
+                saved[key] = dict(quote)
+            results[key] = saved[key]["value"]
+            if error is None and history is not None:
+                try:
+                    history.record(key, value, now)
+                except Exception as e:
+                    print("[PRICE] Gagal catat price history:", e)
+        if self.store is not None:
+            for key, quote in saved.items():
+                try:
+                    self.store.put(key, quote, CACHE_SECONDS)
+                    if quote["fetched_at"] is None:
+                        # gagal & belum punya harga lokal: pakai harga terakhir di store (kalau ada)
+                        shared = self.store.get(key)
+                        if shared:
+                            with self._lock:
+                                results[key] = self._adopt(key, shared)
+                except Exception as e:
+                    print("[PRICE] Gagal simpan shared cache:", e)
+
+        for key in leased:
+            quote = self._await_shared(key, provider, started)
+            with self._lock:
+                if quote is not None:
+                    results[key] = self._adopt(key, quote)
+                else:
+                    current = self._quotes.get(key)
+                    results[key] = current["value"] if current else _default(provider)
+        return results
+
+    def _submit(self, keys):
+        """
+        Mulai fetch keys yang belum berjalan (provider batch: 1 job untuk semua key-nya).
+        Return {key: Future}. Panggil dengan _lock dipegang.
+        """
+        groups = {}
+        for key in keys:
+            if key not in self._inflight:
+                groups.setdefault(_split(key)[0], []).append(key)
+        jobs = [(provider, job) for provider, group in groups.items()
+                for job in ([group] if provider in BATCH_PROVIDERS else [[k] for k in group])]
+        # job tanpa dependensi dulu, supaya fetch dependensinya sudah ada di _inflight
+        jobs.sort(key=lambda j: any(k in DEPENDS for k in j[1]))
+        for provider, job in jobs:
+            # dependensi yang belum pernah punya quote & sedang di-fetch: tunggu selesai dulu
+            # (mis. gold tanpa kurs → harga dari FX_FALLBACK yang ikut di-cache)
+            waits = [self._inflight[d] for k in job for d in DEPENDS.get(k, ())
+                     if d in self._inflight and not (self._quotes.get(d) or {}).get("fetched_at")]
+            if waits:
+                future = self._after(waits, provider, job)
+            else:
+                future = self._pool.submit(self._run, provider, job)
+            for key in job:
+                self._inflight[key] = future
+        return {key: self._inflight[key] for key in keys}
+
+    def _after(self, waits, provider, job):
+        """
+        Future untuk _run(provider, job) yang baru di-submit ke pool setelah semua future di
+        waits selesai (lewat done callback, tidak ada thread pool yang diblok menunggu).
+        """
+        future, pending, lock = Future(), [len(waits)], threading.Lock()
+
+        def relay(inner):
+            if inner.exception() is not None:
+                future.set_exception(inner.exception())
+            else:
+                future.set_result(inner.result())
+
+        def start(_):
+            with lock:
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            try:
+                self._pool.submit(self._run, provider, job).add_done_callback(relay)
+            except RuntimeError as e:  # pool sudah shutdown
+                with self._lock:
+                    for key in job:
+                        self._inflight.pop(key, None)
+                future.set_exception(e)
+
+        for wait in waits:
+            wait.add_done_callback(start)
+        return future
+
+    def _due(self, quote, now):
+        if quote.get("failed_at") and now - quote["failed_at"] < RETRY_SECONDS:
+            return False
+        return quote["fetched_at"] is None or now - quote["fetched_at"] >= REFRESH_SECONDS
+
+    # --- baca ---
+    def get_many(self, keys):
+        """{key: nilai}; quote yang sudah ada langsung dipakai (walau basi), cold start menunggu deadline"""
+        self._start_refresher()
+        now = time.time()
+        result, missing, due = {}, [], []
+        keys = list(dict.fromkeys(keys))
+        deps = [d for k in keys for d in DEPENDS.get(k, ()) if d not in keys]
+        with self._lock:
+            for key in keys:
+                self._requested[key] = now
+                quote = self._quotes.get(key)
+                if quote is None:
+                    missing.append(key)
+                    continue
+                result[key] = quote["value"]
+                if self._due(quote, now):
+                    due.append(key)
+            # dependensi cukup di-fetch/di-refresh di background, tidak ditunggu
+            for key in dict.fromkeys(deps):
+                self._requested[key] = now
+                quote = self._quotes.get(key)
+                if quote is None or self._due(quote, now):
+                    due.append(key)
+            # revalidate di background + fetch yang belum pernah ada (digabung per provider)
+            futures = self._submit(missing + due)
+
+        start = time.monotonic()
+        for key in missing:
+            provider, _ = _split(key)
+            remaining = DEADLINES.get(provider, 5) - (time.monotonic() - start)
+            try:
+                result[key] = futures[key].result(timeout=max(remaining, 0))[key]
+            except TimeoutError:
+                print(f"[PRICE] {key} lewat deadline, pakai nilai default")
+                result[key] = _default(provider)
+            except Exception as e:
+                print(f"[PRICE] {key} gagal ({e}), pakai nilai default")
+                result[key] = _default(provider)
+        return result
+
+    def get(self, key):
+        return self.get_many([key])[key]
+
+    def peek(self, key):
+        """
+        Nilai quote yang sudah ada (lokal / shared store) atau None, tanpa submit fetch.
+        Aman dipanggil dari dalam provider (thread pool ini sendiri).
+        """
+        with self._lock:
+            quote = self._quotes.get(key)
+            if quote is not None and quote.get("fetched_at"):
+                return quote["value"]
+        if self.store is None:
+            return None
+        try:
+            shared = self.store.get(key)
+        except Exception as e:
+            print("[PRICE] Shared cache error:", e)
+            return None
+        if not shared or not shared.get("fetched_at") or shared["value"] is None:
+            return None
+        with self._lock:
+            return self._adopt(key, shared)
+
+    def quotes(self, keys=None):
+        """Status quote: {key: {"value", "age" (detik), "stale", "error"}}"""
+        now = time.time()
+        with self._lock:
+            items = [(k, dict(q)) for k, q in self._quotes.items() if keys is None or k in keys]
+        out = {}
+        for key, q in items:
+            age = int(now - q["fetched_at"]) if q["fetched_at"] else None
+            out[key] = {
+                "value": q["value"],
+                "age": age,
+                "stale": age is None or age >= CACHE_SECONDS,
+                "error": q.get("error"),
+            }
+        return out
+
+    # --- refresher background ---
+    def _start_refresher(self):
+        if not REFRESHER or (self._refresher is not None and self._refresher.is_alive()):
+            return
+        with self._lock:
+            if self._refresher is None or not self._refresher.is_alive():
+                self._refresher = threading.Thread(target=self._refresh_loop, name="price-refresher", daemon=True)
+                self._refresher.start()
+
+    def refresh_due(self):
+        """Submit refresh untuk quote yang sering diminta dan hampir/sudah basi"""
+        now = time.time()
+        with self._lock:
+            due = []
+            for key, last in list(self._requested.items()):
+                if now - last > IDLE_SECONDS:
+                    self._requested.pop(key)
+                    self._quotes.pop(key, None)  # cache mengikuti simbol yang masih dipakai
+                    continue
+                quote = self._quotes.get(key)
+                if quote is None or self._due(quote, now):
+                    due.append(key)
+            self._submit(due)
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(TICK_SECONDS)
+            try:
+                self.refresh_due()
+            except Exception as e:
+                print("[PRICE] Refresher error:", e)
+
+
+service = PriceService()
+
+
+def fx_rate(pair="USDIDR", at=None):
+    """
+    Kurs pair. Tanpa `at`: quote FX terakhir yang sudah ada (service.peek, tanpa fetch —
+    fetch_gold memanggil ini dari dalam pool PriceService; fx:USDIDR sendiri di-fetch &
+    di-refresh sebagai dependensi "gold", dan fetch gold menunggu fetch kurs pertama). Dengan `at` (epoch): dari series historis lokal.
+    Kalau tidak ada data: kurs terakhir yang pernah tercatat, lalu FX_FALLBACK.
+    """
+    key = fx_key(pair)
+    rate = None
+    if at is None:
+        rate = service.peek(key) or None
+    if rate is None and history is not None:
+        rate = history.as_of(key, at if at is not None else time.time())
+    return rate or FX_FALLBACK[pair.upper()]
+
+
+def init_store(data_dir):
+    """
+    Aktifkan shared cache di <data_dir>/price_cache.db (atau BUKABOX_PRICE_CACHE; '0' = mati)
+    registry simbol crypto di <data_dir>/crypto_symbols.json dan deret waktu harga di
+    <data_dir>/price_history/.
+    """
+    global registry, history
+    registry = SymbolRegistry(os.path.join(data_dir, "crypto_symbols.json"))
+    history = PriceHistory(os.path.join(data_dir, "price_history"))
+    path = os.getenv("BUKABOX_PRICE_CACHE", os.path.join(data_dir, "price_cache.db"))
+    if path != "0":
+        service.attach(SharedPriceStore(path))
@@ -0,0 +1,124 @@
+# === CACHE LAPORAN PDF (content hash) ===
+# PDF laporan disimpan di <user>/reports/ bersama indeks <user>/reports/cache.json:
+#   {"history_2025-10.pdf": {"key": "<sha256>", "created": <epoch>, "size": <bytes>}}
+# key = sha256(versi template + hash isi snapshot + input net worth). Selama key sama,
+# PDF tersimpan langsung dipakai (dengan ETag = key dan Last-Modified = created), jadi
+# klik ulang tanpa perubahan data tidak me-render ulang dokumen. Perubahan cashflow
+# (expense dsb.) sudah tercakup lewat input net worth di key; route yang menulis ulang
+# snapshot bulan itu (snapshot, net worth snapshot) membuang entri cache-nya.
+# Semua penulis PDF (route, job, batch) me-render ke file tmp lalu publish(): rename ke
+# nama final + entri indeks ditulis di bawah lock indeks yang sama.
+# Route PDF me-render ke memori (BytesIO); hasilnya baru ditulis ke disk kalau
+# should_persist() menilai layak: bulan yang sudah lewat (snapshot final) atau render
+# yang lambat. BUKABOX_REPORT_PERSIST=auto (default) | always | never.
+
+import os, json, time, hashlib, datetime
+import ledger
+
+
+TEMPLATE_VERSION = "history-pdf/1"
+INDEX = "cache.json"
+PERSIST = os.getenv("BUKABOX_REPORT_PERSIST", "auto")
+PERSIST_MIN_SECONDS = 0.5  # render selambat ini selalu disimpan
+
+
+def history_name(month):
+    return f"history_{month}.pdf"
+
+
+def annual_name(year, ext="pdf"):
+    return f"annual_{year}.{ext}"
+
+
+def report_key(*parts):
+    """sha256 dari versi template + bagian-bagian input (JSON kanonik)"""
+    h = hashlib.sha256(TEMPLATE_VERSION.encode())
+    for part in parts:
+        if isinstance(part, bytes):
+            h.update(hashlib.sha256(part).digest())
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str, ensure_ascii=False).encode())
+    return h.hexdigest()
+
+
+def _index_path(reports_dir):
+    return os.path.join(reports_dir, INDEX)
+
+
+def _read_index(reports_dir):
+    try:
+        with open(_index_path(reports_dir), encoding="utf-8") as f:
+            index = json.load(f)
+        return index if isinstance(index, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def lookup(reports_dir, name, key):
+    """(path, meta) kalau PDF tersimpan masih cocok dengan key, selain itu None"""
+    meta = _read_index(reports_dir).get(name)
+    path = os.path.join(reports_dir, name)
+    if not meta or meta.get("key") != key:
+        return None
+    try:
+        if os.path.getsize(path) != meta.get("size"):
+            return None
+    except OSError:
+        return None
+    return path, meta
+
+
+def publish(reports_dir, name, key, tmp):
+    """
+    Pindahkan PDF hasil render (file tmp) ke reports_dir/name dan catat sebagai hasil untuk
+    key. Rename file + tulis indeks terjadi di bawah 1 lock, jadi render lain untuk nama
+    yang sama (job, route export, batch) tidak bisa membuat key A menunjuk ke isi PDF B.
+    """
+    path = os.path.join(reports_dir, name)
+    index_path = _index_path(reports_dir)
+    with ledger.locked(index_path):
+        os.replace(tmp, path)
+        meta = {"key": key, "created": time.time(), "size": os.path.getsize(path)}
+        index = _read_index(reports_dir)
+        index[name] = meta
+        ledger.write_atomic(index_path, json.dumps(index, indent=2))
+    return path, meta
+
+
+def should_persist(month, render_seconds):
+    """Simpan ke disk? Bulan berjalan yang cepat di-render cukup di-stream dari memori."""
+    if PERSIST in ("always", "never"):
+        return PERSIST == "always"
+    return month < datetime.date.today().strftime("%Y-%m") or render_seconds >= PERSIST_MIN_SECONDS
+
+
+def store_bytes(reports_dir, name, key, data):
+    """Tulis PDF hasil render di memori (atomic) lalu catat di indeks"""
+    os.makedirs(reports_dir, exist_ok=True)
+    path = os.path.join(reports_dir, name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    return publish(reports_dir, name, key, tmp)
+
+
+def invalidate(reports_dir, name):
+    """Buang entri cache (dan file PDF-nya)"""
+    index_path = _index_path(reports_dir)
+    if not os.path.exists(index_path):
+        return False
+    with ledger.locked(index_path):
+        index = _read_index(reports_dir)
+        if index.pop(name, None) is None:
+            return False
+        ledger.write_atomic(index_path, json.dumps(index, indent=2))
+        try:
+            os.remove(os.path.join(reports_dir, name))
+        except OSError:
+            pass
+    print(f"[PDF] Cache {name} di-invalidate")
+    return True
+
+
+def invalidate_month(user_dir, month):
+    return invalidate(os.path.join(user_dir, "reports"), history_name(month))
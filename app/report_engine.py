@@ -0,0 +1,300 @@
+# === REPORT ENGINE (ReportLab) ===
+# Font & stylesheet laporan PDF di-resolve dan didaftarkan sekali per proses (lazy, atau
+# lewat warm_up() saat startup); render laporan cukup mengerjakan layout.
+#   render_history(target, month, snapshot, nw_summary) → target = path atau file-like
+#   render_annual(target, year, reports)                  → semua bulan dalam 1 dokumen
+# Font: Poppins-Light → Poppins-Regular / DejaVuSans → Helvetica (bawaan ReportLab).
+
+import os, threading
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.graphics.shapes import Drawing
+from reportlab.graphics.charts.piecharts import Pie
+
+
+# Coba prioritas Poppins-Light untuk efek tipis (setara font-weight 200)
+LIGHT_FONTS = [
+    "/usr/share/fonts/truetype/poppins/Poppins-Light.ttf",
+    "/Library/Fonts/Poppins-Light.ttf",
+]
+REGULAR_FONTS = [
+    "/usr/share/fonts/truetype/poppins/Poppins-Regular.ttf",
+    "/Library/Fonts/Poppins-Regular.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+
+base_font = None
+STYLES = None
+_lock = threading.Lock()
+
+
+def _register_font():
+    """Daftarkan font pertama yang tersedia. Return nama font."""
+    try:
+        for name, candidates in (("PoppinsLight", LIGHT_FONTS), ("Poppins", REGULAR_FONTS)):
+            for fp in candidates:
+                if os.path.exists(fp):
+                    pdfmetrics.registerFont(TTFont(name, fp))
+                    return name
+    except Exception as e:
+        print(f"[FONT] Gagal memuat Poppins: {e}")
+    return "Helvetica"
+
+
+def _build_styles(font):
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name="Header", fontName=font, fontSize=18,
+                              leading=24, textColor=colors.HexColor("#2F3E46"), spaceAfter=14))
+    styles.add(ParagraphStyle(name="SubHeader", fontName=font, fontSize=12,
+                              leading=16, textColor=colors.HexColor("#495057"), spaceAfter=8))
+    styles.add(ParagraphStyle(name="NormalText", fontName=font, fontSize=10,
+                              leading=14, textColor=colors.black))
+    return styles
+
+
+def warm_up():
+    """Resolve font & stylesheet (sekali per proses)"""
+    global base_font, STYLES
+    if STYLES is None:
+        with _lock:
+            if STYLES is None:
+                base_font = _register_font()
+                STYLES = _build_styles(base_font)
+                print(f"[PDF] Report engine siap (font {base_font})")
+    return STYLES
+
+
+def _document(target):
+    if isinstance(target, str):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+    return SimpleDocTemplate(
+        target,
+        pagesize=A4,
+        rightMargin=36,
+        leftMargin=36,
+        topMargin=40,
+        bottomMargin=40
+    )
+
+
+def render_history(target, month, data, nw_summary):
+    """
+    Render laporan bulanan ke PDF gaya profesional (font Poppins + layout rapi).
+    Semua tabel seragam, warna pastel senada dashboard.
+    """
+    warm_up()
+    _document(target).build(history_elements(month, data, nw_summary))
+
+
+def render_annual(target, year, reports):
+    """Laporan tahunan: reports = [(bulan, snapshot, nw_summary)], 1 bulan per bagian"""
+    warm_up()
+    elements = [
+        Paragraph(f"BUKABOX Annual Report {year}", STYLES["Header"]),
+        Paragraph(f"{len(reports)} bulan: " + ", ".join(month for month, _, _ in reports), STYLES["SubHeader"]),
+    ]
+    for month, data, nw_summary in reports:
+        elements.append(PageBreak())
+        elements.extend(history_elements(month, data, nw_summary))
+    _document(target).build(elements)
+
+
+def history_elements(month, data, nw_summary):
+    """Flowable laporan 1 bulan"""
+    summary = data.get("summary", {})
+    entries = data.get("entries", {})
+    elements = []
+
+    # === HEADER ===
+    elements.append(Paragraph("BUKABOX Financial Report", STYLES["Header"]))
+    elements.append(Paragraph(f"Periode: {month}", STYLES["SubHeader"]))
+    elements.append(Spacer(1, 10))
+
+    # === DONUT CHART ===
+    try:
+        total_income = float(summary.get("income", 0) or 0)
+        total_expense = float(summary.get("expense", 0) or 0)
+        total_invest = float(summary.get("investment", 0) or 0)
+        total_buffer = abs(float(summary.get("buffer", 0) or 0))
+        total_all = total_income + total_expense + total_invest + total_buffer or 1
+
+        pie_vals = [
+            (total_income / total_all) * 100,
+            (total_expense / total_all) * 100,
+            (total_invest / total_all) * 100,
+            (total_buffer / total_all) * 100
+        ]
+        labels = ["Income", "Expense", "Investment", "Buffer"]
+
+        d = Drawing(260, 160)
+        pie = Pie()
+        pie.x = 65
+        pie.y = 15
+        pie.width = 130
+        pie.height = 130
+        pie.data = pie_vals
+        pie.labels = [f"{lbl} {val:.1f}%" for lbl, val in zip(labels, pie_vals)]
+        pie.sideLabels = True
+        pie.startAngle = 90
+        pie.slices.strokeWidth = 0.3
+        pie.slices.strokeColor = colors.white
+
+        pastel = [
+            colors.HexColor("#A5C8E4"),  # income
+            colors.HexColor("#F4C7B8"),  # expense
+            colors.HexColor("#B8E4C9"),  # invest
+            colors.HexColor("#EAD1DC"),  # buffer
+        ]
+        for i, c in enumerate(pastel):
+            pie.slices[i].fillColor = c
+
+        d.add(pie)
+        elements.append(d)
+        elements.append(Spacer(1, 20))
+    except Exception as e:
+        print(f"[PDF Chart] Gagal render donut: {e}")
+
+    # === TABEL RINGKASAN ===
+    elements.append(Paragraph("RINGKASAN KEUANGAN", STYLES["SubHeader"]))
+    summary_table = [
+        ["Income", f"Rp {total_income:,.0f}"],
+        ["Expense", f"Rp {total_expense:,.0f}"],
+        ["Investment", f"Rp {total_invest:,.0f}"],
+        ["Buffer", f"Rp {float(summary.get('buffer', 0) or 0):,.0f}"]
+    ]
+    t = Table(summary_table, colWidths=[250, 180])
+    t.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#CCCCCC")),
+        ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#F8F9FA")),
+        ("FONTNAME", (0, 0), (-1, -1), base_font),
+        ("FONTSIZE", (0, 0), (-1, -1), 10),
+        ("ALIGN", (1, 0), (-1, -1), "RIGHT")
+    ]))
+    elements.append(t)
+    elements.append(Spacer(1, 18))
+
+    # === FUNGSI PEMBANGUN TABEL ===
+    def make_table(title, headers, rows, widths):
+        elements.append(Paragraph(title.upper(), STYLES["SubHeader"]))
+        data = [headers] + rows
+        tbl = Table(data, colWidths=[500 / len(headers)] * len(headers))  # sejajarkan semua tabel
+        tbl.setStyle(TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#D3D3D3")),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E9ECEF")),
+            ("FONTNAME", (0, 0), (-1, -1), base_font),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("ALIGN", (2, 1), (2, -1), "RIGHT"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+            ("TOPPADDING", (0, 0), (-1, -1), 4),
+        ]))
+        elements.append(tbl)
+        elements.append(Spacer(1, 16))
+
+    # === PENDAPATAN ===
+    if entries.get("income"):
+        rows = []
+        for i in entries["income"]:
+            rows.append([
+                i.get("date", ""),
+                i.get("stream", ""),
+                f"Rp {float(i.get('amount', 0) or 0):,.0f}",
+                i.get("note", "")
+            ])
+        make_table("Daftar Pendapatan", ["Tanggal", "Stream", "Jumlah", "Catatan"], rows, [90, 160, 100, 80])
+
+    # === PENGELUARAN ===
+    if entries.get("expense"):
+        rows = []
+        for e in entries["expense"]:
+            rows.append([
+                e.get("date", ""),
+                e.get("category", ""),
+                f"Rp {float(e.get('amount', 0) or 0):,.0f}",
+                e.get("note", "")
+            ])
+        make_table("Daftar Pengeluaran", ["Tanggal", "Kategori", "Jumlah", "Catatan"], rows, [90, 160, 100, 80])
+
+    # === INVESTASI ===
+    if entries.get("investment"):
+        rows = []
+        for inv in entries["investment"]:
+            rows.append([
+                inv.get("category", ""),
+                inv.get("asset", ""),
+                f"Rp {float(inv.get('amount_idr', inv.get('amount', 0) or 0)):,.0f}",
+                inv.get("note", "")
+            ])
+        make_table("Daftar Investasi", ["Kategori", "Aset", "Modal (Rp)", "Catatan"], rows, [110, 110, 100, 90])
+        # === NET WORTH SUMMARY ===
+    try:
+        if nw_summary is None:
+            raise ValueError("data net worth tidak tersedia")
+
+        elements.append(Spacer(1, 20))
+        elements.append(Paragraph("NET WORTH SUMMARY", STYLES["SubHeader"]))
+        elements.append(Spacer(1, 6))
+
+        data_networth = [
+            ["Investment", f"Rp {nw_summary['investment']:,.0f}"],
+            ["Emergency Fund", f"Rp {nw_summary['emergency']:,.0f}"],
+            ["Buffer (Cash)", f"Rp {nw_summary['buffer']:,.0f}"],
+            ["Total Assets", f"Rp {nw_summary['investment'] + nw_summary['emergency'] + nw_summary['buffer']:,.0f}"],
+            ["Liabilities", f"Rp {nw_summary['liabilities']:,.0f}"],
+            ["Net Worth", f"Rp {nw_summary['net_worth']:,.0f}"],
+        ]
+
+        t_networth = Table(data_networth, colWidths=[220, 180])
+        t_networth.setStyle(TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#CCCCCC")),
+            ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#F8F9FA")),
+            ("FONTNAME", (0, 0), (-1, -1), base_font),
+            ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+            ("FONTSIZE", (0, 0), (-1, -1), 10),
+        ]))
+        elements.append(t_networth)
+
+        # === DETAIL LIABILITIES ===
+        elements.append(Spacer(1, 18))
+        elements.append(Paragraph("LIABILITIES DETAIL", STYLES["SubHeader"]))
+        elements.append(Spacer(1, 6))
+
+        liabilities = nw_summary.get("liabilities_detail", [])
+
+        if liabilities:
+            liab_data = [["Date", "Category", "Amount", "Remaining", "Progress", "Note"]]
+            for l in liabilities:
+                liab_data.append([
+                    l.get("date", "-"),
+                    l.get("category", "-"),
+                    f"Rp {float(l.get('amount', 0)):,.0f}",
+                    f"Rp {float(l.get('remaining', 0)):,.0f}",
+                    f"{float(l.get('progress', 0)):,.1f}%",
+                    l.get("note", "-")
+                ])
+
+            t_liab = Table(liab_data, colWidths=[65, 70, 70, 70, 50, 100])
+            t_liab.setStyle(TableStyle([
+                ("GRID", (0, 0), (-1, -1), 0.4, colors.HexColor("#DDDDDD")),
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E9ECEF")),
+                ("FONTNAME", (0, 0), (-1, -1), base_font),
+                ("FONTSIZE", (0, 0), (-1, -1), 9),
+                ("ALIGN", (2, 1), (4, -1), "RIGHT"),
+                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ]))
+            elements.append(t_liab)
+        else:
+            elements.append(Paragraph("Tidak ada data liabilitas aktif.", STYLES["NormalText"]))
+
+    except Exception as e:
+        print("[PDF] Gagal menambahkan Net Worth section:", e)
+
+    # === FOOTER ===
+    elements.append(Spacer(1, 30))
+    elements.append(Paragraph("<i>Generated automatically by Bukabox Financial Dashboard</i>", STYLES["NormalText"]))
+
+    return elements
@@ -0,0 +1,210 @@
+# === ANTRIAN JOB LAPORAN PDF (process pool) ===
+# Render PDF dipindah dari worker gunicorn ke process pool terpisah (spawn, tiap proses
+# memanggil report_engine.warm_up() sekali), jadi worker web tetap bebas melayani
+# dashboard dan render besar tidak kena timeout worker.
+#   submit()  → job id = prefix key report_cache (isi snapshot + net worth + template),
+#               jadi job identik (di worker mana pun) otomatis digabung
+#   status()  → queued | running | done | failed
+# Status job ditulis ke <user>/reports/jobs/<id>.json supaya polling ke worker gunicorn
+# lain tetap melihat progresnya: "running" ditulis oleh proses render sendiri, dan job
+# queued/running yang worker pemiliknya (pid "owner") sudah mati dianggap gagal, jadi
+# submit berikutnya me-render ulang. Antrian dibatasi MAX_PENDING job per proses.
+# submit_annual() = laporan tahunan 1 user (route web) sebagai 1 job di pool yang sama.
+# render_batch() (laporan tahunan massal, CLI) memakai pool sendiri selebar jumlah core.
+
+import os, json, time, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import ledger
+import report_cache
+import report_engine
+
+
+WORKERS = int(os.getenv("BUKABOX_REPORT_WORKERS", str(min(2, os.cpu_count() or 1))))
+MAX_PENDING = int(os.getenv("BUKABOX_REPORT_QUEUE", "16"))
+JOB_TIMEOUT = 10 * 60  # job queued/running lebih lama dari ini dianggap mati
+ID_LENGTH = 32
+
+
+class QueueFull(Exception):
+    pass
+
+
+_pool = None
+_jobs = {}  # (reports_dir, id) -> Future (job di proses ini)
+_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=report_engine.warm_up)
+    return _pool
+
+
+def render_to(reports_dir, name, key, month, data, nw_summary):
+    """
+    Dijalankan di process pool: render ke file sementara lalu publish ke reports_dir/name
+    (rename + entri indeks untuk key sekaligus, lihat report_cache.publish)
+    """
+    tmp = os.path.join(reports_dir, f"{name}.{os.getpid()}.tmp")
+    report_engine.render_history(tmp, month, data, nw_summary)
+    return report_cache.publish(reports_dir, name, key, tmp)[1]["size"]
+
+
+def run_job(reports_dir, job_id, name, key, month, data, nw_summary):
+    """Dijalankan di process pool: tandai job running lalu render"""
+    _write_status(reports_dir, job_id, status="running", pid=os.getpid(), started=time.time())
+    return render_to(reports_dir, name, key, month, data, nw_summary)
+
+
+def render_annual_to(reports_dir, name, key, year, reports):
+    """Dijalankan di process pool: laporan tahunan gabungan"""
+    tmp = os.path.join(reports_dir, f"{name}.{os.getpid()}.tmp")
+    report_engine.render_annual(tmp, year, reports)
+    return report_cache.publish(reports_dir, name, key, tmp)[1]["size"]
+
+
+def render_batch(tasks, workers=None):
+    """
+    Render banyak laporan paralel di semua core. tasks = [(reports_dir, name, key, fn, args)]
+    dengan fn = render_to / render_annual_to (args tanpa reports_dir/name/key). Hasil dicatat
+    di report_cache oleh proses render. Return {(reports_dir, name): error atau None}.
+    """
+    results = {}
+    if not tasks:
+        return results
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=report_engine.warm_up) as pool:
+        futures = {
+            pool.submit(fn, reports_dir, name, key, *args): (reports_dir, name)
+            for reports_dir, name, key, fn, args in tasks
+        }
+        for future in as_completed(futures):
+            reports_dir, name = futures[future]
+            try:
+                future.result()
+                results[(reports_dir, name)] = None
+            except Exception as e:
+                print(f"[PDF BATCH] Gagal {reports_dir}/{name}: {e}")
+                results[(reports_dir, name)] = str(e)
+    return results
+
+
+# --- status ---
+def _status_path(reports_dir, job_id):
+    return os.path.join(reports_dir, "jobs", f"{job_id}.json")
+
+
+def _write_status(reports_dir, job_id, **fields):
+    path = _status_path(reports_dir, job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    current = _read_status(reports_dir, job_id) or {}
+    current.update(fields, id=job_id, updated=time.time())
+    ledger.write_atomic(path, json.dumps(current))
+    return current
+
+
+def _read_status(reports_dir, job_id):
+    try:
+        with open(_status_path(reports_dir, job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    if not pid:
+        return True  # status lama tanpa owner: hanya dibatasi JOB_TIMEOUT
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _alive(job):
+    return (bool(job) and job.get("status") in ("queued", "running")
+            and time.time() - job["updated"] < JOB_TIMEOUT and _pid_alive(job.get("owner")))
+
+
+def status(reports_dir, job_id):
+    """Status job (dict) atau None kalau tidak dikenal"""
+    job = _read_status(reports_dir, job_id)
+    if job is None:
+        return None
+    if job["status"] in ("queued", "running") and not _alive(job):
+        job = dict(job, status="failed", error="job terhenti (worker mati / timeout), silakan ulangi")
+    if job["status"] == "done" and report_cache.lookup(reports_dir, job["name"], job["key"]) is None:
+        job = dict(job, status="expired")  # data berubah / cache di-invalidate
+    return job
+
+
+def _finish(reports_dir, job_id, name, future):
+    with _lock:
+        _jobs.pop((reports_dir, job_id), None)
+    try:
+        future.result()
+        _write_status(reports_dir, job_id, status="done", finished=time.time())
+        print(f"[PDF JOB] {job_id[:8]} selesai: {name}")
+    except Exception as e:
+        _write_status(reports_dir, job_id, status="failed", error=str(e), finished=time.time())
+        print(f"[PDF JOB] {job_id[:8]} gagal: {e}")
+
+
+# --- submit ---
+def _enqueue(reports_dir, job_id, name, key, fn, args, **fields):
+    """
+    Antrikan fn(reports_dir, job_id, *args) di pool (fn mencatat sendiri hasilnya di
+    report_cache). name/key = laporan utama job, dipakai cek expired & download.
+    """
+    with _lock:
+        existing = _read_status(reports_dir, job_id)
+        if existing is not None and ((reports_dir, job_id) in _jobs or _alive(existing)):
+            return existing
+        if len(_jobs) >= MAX_PENDING:
+            raise QueueFull(f"antrian laporan penuh ({MAX_PENDING} job)")
+        job = _write_status(reports_dir, job_id, status="queued", name=name, key=key, owner=os.getpid(),
+                            pid=None, created=time.time(), error=None, **fields)
+        future = _executor().submit(fn, reports_dir, job_id, *args)
+        _jobs[(reports_dir, job_id)] = future
+    future.add_done_callback(lambda f: _finish(reports_dir, job_id, name, f))
+    print(f"[PDF JOB] {job_id[:8]} diantrikan: {name}")
+    return job
+
+
+def submit(reports_dir, month, data, nw_summary, key):
+    """
+    Antrikan render laporan bulan `month`. Return status job; job identik yang masih
+    berjalan atau laporan yang sudah ada di cache tidak di-render ulang.
+    """
+    job_id = key[:ID_LENGTH]
+    name = report_cache.history_name(month)
+    if report_cache.lookup(reports_dir, name, key) is not None:
+        return _write_status(reports_dir, job_id, status="done", month=month, name=name, key=key)
+    return _enqueue(reports_dir, job_id, name, key, run_job,
+                    (name, key, month, data, nw_summary), month=month)
+
+
+def run_renders(reports_dir, job_id, renders):
+    """Dijalankan di process pool: beberapa render berurutan (laporan tahunan 1 user)"""
+    _write_status(reports_dir, job_id, status="running", pid=os.getpid(), started=time.time())
+    for name, key, fn, args in renders:
+        fn(reports_dir, name, key, *args)
+
+
+def submit_annual(reports_dir, year, tasks, key):
+    """
+    Antrikan laporan tahunan 1 user sebagai 1 job di pool bersama (ikut batas MAX_PENDING).
+    tasks = [(reports_dir, name, key, fn, args)] yang belum valid di cache, laporan gabungan
+    terakhir; key = key laporan gabungan.
+    """
+    job_id = key[:ID_LENGTH]
+    if not tasks:
+        return _write_status(reports_dir, job_id, status="done", year=year,
+                             name=report_cache.annual_name(year), key=key)
+    return _enqueue(reports_dir, job_id, report_cache.annual_name(year), key, run_renders,
+                    ([(t[1], t[2], t[3], t[4]) for t in tasks],), year=year)
@@ -0,0 +1,518 @@
+# === STORAGE BACKEND ===
+# Semua data per-user diakses lewat load_json/save_json (main.py & helpers.py),
+# yang sekarang diteruskan ke salah satu backend:
+#   - JsonBackend   : file JSON di DATA_DIR/<user>/ (default, perilaku lama)
+#   - SqliteBackend : SQLite (WAL), tabel ber-index untuk cashflow, income,
+#                     investment, emergency & liabilities
+# Pilih dengan env BUKABOX_STORAGE=json|sqlite. Untuk SQLite, default 1 DB per user
+# (<user_dir>/bukabox.db); set BUKABOX_SQLITE_PATH untuk 1 DB bersama semua user.
+#
+# version(user_dir, filename) mengembalikan penanda versi yang berubah di setiap tulis
+# (dipakai cache hasil hitungan seperti net worth).
+#
+# Selain load/save/append, backend menyediakan query yang dipakai route:
+# month_records(), type_totals(), monthly_totals() dan loan_payments(). Total per bulan/type
+# dibaca dari agregat materialized (aggregates.json / tabel aggregates) yang ikut
+# di-update setiap tulis, jadi cukup O(jumlah bulan).
+
+import os, json, sqlite3, threading, datetime
+import ledger
+import columnar
+import aggregates
+from ledger import month_of
+from columnar import rupiah
+from aggregates import scan_loan_payments
+from doc_cache import read_json, invalidate, file_signature
+
+
+STORAGE = os.getenv("BUKABOX_STORAGE", "json").lower()
+SQLITE_PATH = os.getenv("BUKABOX_SQLITE_PATH", "")
+
+
+def split_path(user_dir, filename):
+    """Normalisasi (user_dir, filename); filename boleh path absolut (gaya lama)"""
+    path = os.path.normpath(os.path.join(user_dir, filename))
+    rel = os.path.relpath(path, user_dir)
+    if rel.startswith(".."):
+        return os.path.dirname(path), os.path.basename(path)
+    return os.path.normpath(user_dir), rel
+
+
+def scan_month_records(rows, month):
+    """Record dengan tanggal di bulan (YYYY-MM) tertentu"""
+    return [r for r in rows if month_of(r.get("date", "")) == month]
+
+
+def scan_type_totals(rows, month=None):
+    """Total amount (rupiah) per type (income.json tidak punya type → 'income')"""
+    totals = {}
+    for r in rows:
+        if month and month_of(r.get("date", "")) != month:
+            continue
+        t = r.get("type", "income")
+        totals[t] = totals.get(t, 0) + rupiah(r.get("amount", 0))
+    return totals
+
+
+def scan_monthly_totals(rows):
+    """{'YYYY-MM': {type: total}} dengan loop biasa (dipakai untuk data yang masih di buffer)"""
+    out = {}
+    for r in rows:
+        month = month_of(r.get("date", ""))
+        if not month:
+            continue
+        bucket = out.setdefault(month, {})
+        t = r.get("type", "income")
+        bucket[t] = bucket.get(t, 0) + rupiah(r.get("amount", 0))
+    return out
+
+
+def _amount(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class JsonBackend:
+    """Backend file JSON (cashflow.json & income.json memakai ledger partisi bulanan)."""
+
+    name = "json"
+
+    def path(self, user_dir, filename):
+        path = os.path.join(*split_path(user_dir, filename))
+        ledger.restore_legacy(path)  # no-op kecuali BUKABOX_LEDGER=0 dan partisi masih ada
+        return path
+
+    def exists(self, user_dir, filename):
+        return ledger.exists(self.path(user_dir, filename))
+
+    def load(self, user_dir, filename):
+        path = self.path(user_dir, filename)
+        if ledger.is_ledger(path):
+            return ledger.read(path)
+        return read_json(path)
+
+    def version(self, user_dir, filename):
+        path = self.path(user_dir, filename)
+        if ledger.is_ledger(path):
+            return ledger.version(path)
+        try:
+            return file_signature(path)
+        except OSError:
+            return ()
+
+    def save(self, user_dir, filename, data, indent=4):
+        path = self.path(user_dir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if ledger.is_ledger(path):
+            ledger.write_all(path, data)
+            aggregates.refresh(path)
+            return path
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+        os.replace(tmp, path)
+        invalidate(path)
+        return path
+
+    def append(self, user_dir, filename, entry, indent=4):
+        path = self.path(user_dir, filename)
+        if ledger.is_ledger(path):
+            aggregates.record_append(path, entry, ledger.append(path, entry))
+            return ledger.partition_dir(path)
+        data = self._list(user_dir, filename)
+        data.append(entry)
+        return self.save(user_dir, filename, data, indent)
+
+    # --- query ---
+    def _list(self, user_dir, filename):
+        if not self.exists(user_dir, filename):
+            return []
+        try:
+            data = self.load(user_dir, filename)
+        except Exception as e:
+            print(f"[STORAGE] Gagal baca {filename}: {e}")
+            return []
+        return data if isinstance(data, list) else []
+
+    def _rows(self, user_dir, filename, month=None):
+        """Record ledger: 1 partisi kalau month diisi, kalau tidak generator semua partisi"""
+        path = self.path(user_dir, filename)
+        if month:
+            return ledger.read_month(path, month)
+        return ledger.iter_rows(path)
+
+    def _columns(self, user_dir, filename, month=None):
+        """Kolom NumPy per partisi (atau 1 file utuh kalau bukan ledger), di-cache per versi file"""
+        path = self.path(user_dir, filename)
+        if not ledger.is_ledger(path):
+            return [columnar.cached(path, lambda: self._list(user_dir, filename))]
+        parts = [month] if month else ledger.months(path)
+        return [
+            columnar.cached(ledger.partition_path(path, m), lambda m=m: ledger.read_month(path, m))
+            for m in parts
+        ]
+
+    def month_records(self, user_dir, filename, month):
+        if ledger.is_ledger(self.path(user_dir, filename)):
+            return self._rows(user_dir, filename, month)
+        return scan_month_records(self._list(user_dir, filename), month)
+
+    def type_totals(self, user_dir, filename, month=None):
+        path = self.path(user_dir, filename)
+        if ledger.is_ledger(path):
+            return aggregates.type_totals(path, month)
+        return columnar.merge_totals(c.totals(month) for c in self._columns(user_dir, filename, month))
+
+    def monthly_totals(self, user_dir, filename):
+        path = self.path(user_dir, filename)
+        if ledger.is_ledger(path):
+            return aggregates.monthly_totals(path)
+        return columnar.merge_monthly(c.monthly_totals() for c in self._columns(user_dir, filename))
+
+    def rebuild_aggregates(self, user_dir):
+        """Hitung ulang aggregates.json dari ledger mentah. Return jumlah bulan."""
+        total = 0
+        for name in sorted(ledger.LEDGER_FILES):
+            path = self.path(user_dir, name)
+            if ledger.is_ledger(path) and ledger.exists(path):
+                total += aggregates.rebuild(path)
+        return total
+
+    def loan_payments(self, user_dir):
+        path = self.path(user_dir, "cashflow.json")
+        if ledger.is_ledger(path):
+            return aggregates.loan_payments(path)
+        return scan_loan_payments(self._list(user_dir, "cashflow.json"))
+
+
+# nama file → (tabel, kolom ter-index yang diambil dari record)
+TABLES = {
+    "cashflow.json": ("cashflow", ("date", "type", "category", "amount", "note")),
+    "income.json": ("income", ("date", "stream", "amount", "note")),
+    "investment.json": ("investment", ("date", "category", "asset", "amount_idr")),
+    "emergency.json": ("emergency", ("date", "amount", "note")),
+    "liabilities.json": ("liabilities", ("id", "date", "category", "amount", "status")),
+}
+
+NUMERIC_COLUMNS = {"amount", "amount_idr"}
+
+# snapshot bulanan & laporan tetap berupa file (dibaca langsung oleh halaman history/PDF)
+FILE_PREFIXES = ("history" + os.sep, "reports" + os.sep)
+
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_cashflow_month ON cashflow(owner, month, type)",
+    "CREATE INDEX IF NOT EXISTS ix_cashflow_loan ON cashflow(owner, type, note)",
+    "CREATE INDEX IF NOT EXISTS ix_income_month ON income(owner, month)",
+    "CREATE INDEX IF NOT EXISTS ix_investment_asset ON investment(owner, category, asset)",
+    "CREATE INDEX IF NOT EXISTS ix_emergency_month ON emergency(owner, month)",
+    "CREATE INDEX IF NOT EXISTS ix_liabilities_id ON liabilities(owner, id)",
+)
+
+# agregat materialized per (owner, sumber, bulan, type, kategori), dirawat trigger.
+# tabel → (ekspresi type, ekspresi kategori); {r} = NEW/OLD di trigger
+AGGREGATE_SOURCES = {
+    "cashflow": ("COALESCE({r}type, 'income')", "COALESCE({r}category, '')"),
+    "income": ("'income'", "COALESCE({r}stream, '')"),
+}
+
+
+def _aggregate_key(table, r=""):
+    type_sql, cat_sql = AGGREGATE_SOURCES[table]
+    return (f"'{table}'", f"COALESCE({r}month, 'undated')",
+            type_sql.format(r=r), cat_sql.format(r=r))
+
+
+def _aggregate_triggers(table):
+    new = ", ".join(_aggregate_key(table, "NEW."))
+    match = " AND ".join(
+        f"{col} = {expr}"
+        for col, expr in zip(("source", "month", "type", "category"), _aggregate_key(table, "OLD."))
+    )
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS agg_{table}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO aggregates (owner, source, month, type, category, total, n) "
+        f"VALUES (NEW.owner, {new}, ROUND(NEW.amount), 1) "
+        f"ON CONFLICT (owner, source, month, type, category) "
+        f"DO UPDATE SET total = total + excluded.total, n = n + 1; END",
+        f"CREATE TRIGGER IF NOT EXISTS agg_{table}_delete AFTER DELETE ON {table} BEGIN "
+        f"UPDATE aggregates SET total = total - ROUND(OLD.amount), n = n - 1 "
+        f"WHERE owner = OLD.owner AND {match}; "
+        f"DELETE FROM aggregates WHERE owner = OLD.owner AND n <= 0; END",
+    )
+
+
+def _version_triggers():
+    """Counter versi per (owner, file), naik di setiap insert/delete/replace"""
+    bump = ("INSERT INTO versions (owner, name, version) VALUES ({r}.owner, {name}, 1) "
+            "ON CONFLICT (owner, name) DO UPDATE SET version = version + 1")
+    for filename, (table, _) in TABLES.items():
+        for event, r in (("INSERT", "NEW"), ("DELETE", "OLD")):
+            yield (f"CREATE TRIGGER IF NOT EXISTS ver_{table}_{event.lower()} AFTER {event} ON {table} "
+                   f"BEGIN {bump.format(r=r, name=repr(filename))}; END")
+    yield ("CREATE TRIGGER IF NOT EXISTS ver_documents_insert AFTER INSERT ON documents "
+           f"BEGIN {bump.format(r='NEW', name='NEW.name')}; END")
+
+
+class SqliteBackend:
+    """
+    Backend SQLite (WAL). File list utama disimpan per-record di tabel ber-index,
+    file lain (networth.json, expense.json, ...) di tabel documents; history/ tetap file.
+    Data JSON lama otomatis di-import saat pertama kali diakses.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, shared_path=""):
+        self.shared_path = shared_path
+        self.json = JsonBackend()
+        self._local = threading.local()
+
+    # --- koneksi ---
+    def _db_path(self, user_dir):
+        return self.shared_path or os.path.join(user_dir, "bukabox.db")
+
+    def _conn(self, user_dir):
+        conns = self._local.__dict__.setdefault("conns", {})
+        db_path = self._db_path(user_dir)
+        conn = conns.get(db_path)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            conn = sqlite3.connect(db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema(conn)
+            conns[db_path] = conn
+        return conn
+
+    def _create_schema(self, conn):
+        with conn:
+            for table, cols in TABLES.values():
+                col_sql = ", ".join(
+                    f"{c} REAL" if c in NUMERIC_COLUMNS else f"{c} TEXT" for c in cols
+                )
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    f"seq INTEGER PRIMARY KEY AUTOINCREMENT, owner TEXT NOT NULL, "
+                    f"month TEXT, {col_sql}, doc TEXT NOT NULL)"
+                )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "owner TEXT NOT NULL, name TEXT NOT NULL, doc TEXT NOT NULL, "
+                "PRIMARY KEY (owner, name))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            for sql in INDEXES:
+                conn.execute(sql)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS aggregates ("
+                "owner TEXT NOT NULL, source TEXT NOT NULL, month TEXT NOT NULL, "
+                "type TEXT NOT NULL, category TEXT NOT NULL, total REAL NOT NULL, "
+                "n INTEGER NOT NULL, PRIMARY KEY (owner, source, month, type, category))"
+            )
+            for table in AGGREGATE_SOURCES:
+                for sql in _aggregate_triggers(table):
+                    conn.execute(sql)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS versions ("
+                "owner TEXT NOT NULL, name TEXT NOT NULL, version INTEGER NOT NULL, "
+                "PRIMARY KEY (owner, name))"
+            )
+            for sql in _version_triggers():
+                conn.execute(sql)
+            if not conn.execute("SELECT 1 FROM meta WHERE key = 'aggregates'").fetchone():
+                self._rebuild_aggregates(conn)
+
+    def _rebuild_aggregates(self, conn, owner=None):
+        """Isi ulang tabel aggregates dari tabel mentah (semua owner kalau owner=None)"""
+        where, args = ("WHERE owner = ?", (owner,)) if owner else ("", ())
+        conn.execute(f"DELETE FROM aggregates {where}", args)
+        for table in AGGREGATE_SOURCES:
+            key = ", ".join(_aggregate_key(table))
+            conn.execute(
+                f"INSERT INTO aggregates (owner, source, month, type, category, total, n) "
+                f"SELECT owner, {key}, SUM(ROUND(amount)), COUNT(*) "
+                f"FROM {table} {where} GROUP BY 1, 2, 3, 4, 5",
+                args,
+            )
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('aggregates', ?)",
+                     (datetime.datetime.now().isoformat(),))
+
+    # --- import JSON lama ---
+    def _imported(self, conn, owner, name):
+        key = f"imported:{owner}:{name}"
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            return
+        data = None
+        if self.json.exists(owner, name):
+            try:
+                data = self.json.load(owner, name)
+            except Exception as e:
+                print(f"[SQLITE] Gagal import {name}: {e}")
+        with conn:
+            if data is not None:
+                if name in TABLES:
+                    self._insert_rows(conn, owner, name, data if isinstance(data, list) else [])
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO documents (owner, name, doc) VALUES (?, ?, ?)",
+                        (owner, name, json.dumps(data, ensure_ascii=False)),
+                    )
+                print(f"[SQLITE] Import {owner}/{name}")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         (key, datetime.datetime.now().isoformat()))
+
+    def _open(self, user_dir, filename):
+        owner, name = split_path(user_dir, filename)
+        conn = self._conn(owner)
+        self._imported(conn, owner, name)
+        return conn, owner, name
+
+    def _row(self, owner, name, entry):
+        _, cols = TABLES[name]
+        values = []
+        for c in cols:
+            v = entry.get(c) if isinstance(entry, dict) else None
+            if c in NUMERIC_COLUMNS:
+                v = _amount(v)
+            elif c == "note":
+                v = (v or "").strip()
+            values.append(v)
+        date = entry.get("date", "") if isinstance(entry, dict) else ""
+        return (owner, month_of(date), *values, json.dumps(entry, ensure_ascii=False))
+
+    def _insert_rows(self, conn, owner, name, rows):
+        table, cols = TABLES[name]
+        marks = ", ".join("?" * (len(cols) + 3))
+        conn.executemany(
+            f"INSERT INTO {table} (owner, month, {', '.join(cols)}, doc) VALUES ({marks})",
+            [self._row(owner, name, r) for r in rows],
+        )
+
+    def _is_file(self, user_dir, filename):
+        return split_path(user_dir, filename)[1].startswith(FILE_PREFIXES)
+
+    # --- API backend ---
+    def exists(self, user_dir, filename):
+        if self._is_file(user_dir, filename):
+            return self.json.exists(user_dir, filename)
+        conn, owner, name = self._open(user_dir, filename)
+        if name in TABLES:
+            return True
+        row = conn.execute("SELECT 1 FROM documents WHERE owner = ? AND name = ?",
+                           (owner, name)).fetchone()
+        return row is not None
+
+    def load(self, user_dir, filename):
+        if self._is_file(user_dir, filename):
+            return self.json.load(user_dir, filename)
+        conn, owner, name = self._open(user_dir, filename)
+        if name in TABLES:
+            table, _ = TABLES[name]
+            rows = conn.execute(f"SELECT doc FROM {table} WHERE owner = ? ORDER BY seq", (owner,))
+            return [json.loads(doc) for (doc,) in rows]
+        row = conn.execute("SELECT doc FROM documents WHERE owner = ? AND name = ?",
+                           (owner, name)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"{owner}/{name}")
+        return json.loads(row[0])
+
+    def version(self, user_dir, filename):
+        if self._is_file(user_dir, filename):
+            return self.json.version(user_dir, filename)
+        conn, owner, name = self._open(user_dir, filename)
+        row = conn.execute("SELECT version FROM versions WHERE owner = ? AND name = ?",
+                           (owner, name)).fetchone()
+        return (row[0] if row else 0,)
+
+    def save(self, user_dir, filename, data, indent=4):
+        if self._is_file(user_dir, filename):
+            return self.json.save(user_dir, filename, data, indent)
+        conn, owner, name = self._open(user_dir, filename)
+        with conn:
+            if name in TABLES:
+                table, _ = TABLES[name]
+                conn.execute(f"DELETE FROM {table} WHERE owner = ?", (owner,))
+                self._insert_rows(conn, owner, name, data if isinstance(data, list) else [])
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (owner, name, doc) VALUES (?, ?, ?)",
+                    (owner, name, json.dumps(data, ensure_ascii=False)),
+                )
+        return f"{self._db_path(owner)}:{name}"
+
+    def append(self, user_dir, filename, entry, indent=4):
+        conn, owner, name = self._open(user_dir, filename)
+        if name not in TABLES:
+            data = self.load(user_dir, filename) if self.exists(user_dir, filename) else []
+            if not isinstance(data, list):
+                data = []
+            data.append(entry)
+            return self.save(user_dir, filename, data)
+        with conn:
+            self._insert_rows(conn, owner, name, [entry])
+        return f"{self._db_path(owner)}:{name}"
+
+    # --- query ber-index ---
+    def month_records(self, user_dir, filename, month):
+        conn, owner, name = self._open(user_dir, filename)
+        table, _ = TABLES[name]
+        rows = conn.execute(
+            f"SELECT doc FROM {table} WHERE owner = ? AND month = ? ORDER BY seq", (owner, month)
+        )
+        return [json.loads(doc) for (doc,) in rows]
+
+    def type_totals(self, user_dir, filename, month=None):
+        conn, owner, name = self._open(user_dir, filename)
+        sql = "SELECT type, SUM(total) FROM aggregates WHERE owner = ? AND source = ?"
+        args = [owner, TABLES[name][0]]
+        if month:
+            sql += " AND month = ?"
+            args.append(month)
+        return {t: int(total) for t, total in conn.execute(sql + " GROUP BY 1", args)}
+
+    def monthly_totals(self, user_dir, filename):
+        conn, owner, name = self._open(user_dir, filename)
+        out = {}
+        rows = conn.execute(
+            "SELECT month, type, SUM(total) FROM aggregates "
+            "WHERE owner = ? AND source = ? AND month != 'undated' GROUP BY 1, 2",
+            (owner, TABLES[name][0]),
+        )
+        for month, t, total in rows:
+            out.setdefault(month, {})[t] = int(total)
+        return out
+
+    def rebuild_aggregates(self, user_dir):
+        """Hitung ulang tabel aggregates milik user ini. Return jumlah bulan."""
+        conn, owner, _ = self._open(user_dir, "cashflow.json")
+        self._imported(conn, owner, "income.json")
+        with conn:
+            self._rebuild_aggregates(conn, owner)
+        row = conn.execute("SELECT COUNT(DISTINCT source || month) FROM aggregates WHERE owner = ?",
+                           (owner,)).fetchone()
+        return row[0]
+
+    def loan_payments(self, user_dir):
+        conn, owner, _ = self._open(user_dir, "cashflow.json")
+        rows = conn.execute(
+            "SELECT note, SUM(amount) FROM cashflow WHERE owner = ? AND type = 'expense' "
+            "AND lower(category) = 'loan' GROUP BY note",
+            (owner,),
+        )
+        return {note or "": total for note, total in rows}
+
+
+def get_backend():
+    if STORAGE == "sqlite":
+        return SqliteBackend(SQLITE_PATH)
+    if STORAGE != "json":
+        print(f"[STORAGE] BUKABOX_STORAGE={STORAGE} tidak dikenal, pakai json")
+    return JsonBackend()
+
+
+backend = get_backend()
+print(f"[INFO] Storage backend: {backend.name}")
@@ -0,0 +1,215 @@
+# === UNIT OF WORK (per request) ===
+# Membungkus storage backend supaya dalam 1 request:
+#   - load_json() untuk file yang sama cukup dibaca 1x (memo per request)
+#   - save_json()/append_json() ditahan di buffer
+#   - semua perubahan di-flush 1x sebelum response dikirim (after_request, temp file +
+#     os.replace); kalau flush gagal request dijadikan 500 dan flash sukses dibuang,
+#     jadi user tidak diberi tahu "tersimpan" padahal datanya hilang
+# Di luar request context (CLI, job background) semua panggilan langsung ke backend.
+# load() mengembalikan salinan dan save() menyimpan salinan, jadi mutasi in-place tanpa
+# save_json() (atau setelahnya) tidak bocor ke load()/flush berikutnya.
+# Versi file dicatat saat pertama dibaca; file yang ditulis ulang penuh gagal di-flush
+# (FlushError) kalau versinya sudah diubah worker lain sejak itu, bukan menimpa diam-diam.
+
+import os, sys
+from flask import g, has_request_context, session, flash
+import storage
+import doc_cache
+from storage import (split_path, scan_month_records, scan_type_totals,
+                     scan_monthly_totals, scan_loan_payments)
+
+
+class FlushError(Exception):
+    """Sebagian perubahan request gagal ditulis ke backend"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class UnitOfWork:
+    """State 1 request: dokumen yang sudah dibaca/ditulis dan perubahan yang tertunda."""
+
+    def __init__(self):
+        self.docs = {}     # key -> data (memo baca + hasil tulis)
+        self.dirty = {}    # key -> indent, file yang harus ditulis ulang penuh
+        self.pending = {}  # key -> [entry], append yang belum di-flush
+        self.indent = {}
+        self.versions = {}  # key -> versi backend saat dokumen dibaca
+
+    def is_buffered(self, key):
+        return key in self.dirty or key in self.pending
+
+
+class UnitOfWorkBackend:
+    """Backend dengan API sama seperti storage.backend, plus buffer per request."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.name = inner.name
+
+    def _uow(self):
+        if not has_request_context():
+            return None
+        uow = g.get("_uow")
+        if uow is None:
+            uow = g._uow = UnitOfWork()
+        return uow
+
+    def exists(self, user_dir, filename):
+        uow = self._uow()
+        if uow is not None:
+            key = split_path(user_dir, filename)
+            if key in uow.docs or key in uow.pending:
+                return True
+        return self.inner.exists(user_dir, filename)
+
+    def load(self, user_dir, filename):
+        uow = self._uow()
+        if uow is None:
+            return self.inner.load(user_dir, filename)
+
+        key = split_path(user_dir, filename)
+        if key not in uow.docs:
+            data = self._load_versioned(uow, key)
+            if key in uow.pending:
+                data = (data if isinstance(data, list) else []) + uow.pending[key]
+            uow.docs[key] = data
+        return doc_cache.clone(uow.docs[key])
+
+    def _load_versioned(self, uow, key):
+        """Baca dari backend + catat versinya (dibaca ulang kalau berubah selama load)"""
+        for _ in range(3):
+            version = self.inner.version(*key)
+            data = self.inner.load(*key) if self.inner.exists(*key) else []
+            if self.inner.version(*key) == version:
+                break
+        uow.versions[key] = version
+        return data
+
+    def version(self, user_dir, filename):
+        """Versi file di backend; None kalau file punya perubahan yang belum di-flush"""
+        uow = self._uow()
+        if uow is not None and uow.is_buffered(split_path(user_dir, filename)):
+            return None
+        return self.inner.version(user_dir, filename)
+
+    def save(self, user_dir, filename, data, indent=4):
+        uow = self._uow()
+        if uow is None:
+            return self.inner.save(user_dir, filename, data, indent)
+
+        key = split_path(user_dir, filename)
+        uow.docs[key] = doc_cache.clone(data)
+        uow.dirty[key] = indent
+        uow.pending.pop(key, None)
+        return f"{os.path.join(*key)} (buffer)"
+
+    def append(self, user_dir, filename, entry, indent=4):
+        uow = self._uow()
+        if uow is None:
+            return self.inner.append(user_dir, filename, entry, indent)
+
+        key = split_path(user_dir, filename)
+        doc = uow.docs.get(key)
+        if key in uow.docs and not isinstance(doc, list):
+            # dokumen bukan list → timpa seperti perilaku lama (load → [] → append)
+            return self.save(user_dir, filename, [entry], indent)
+        if doc is not None:
+            doc.append(entry)
+        if key not in uow.dirty:
+            uow.pending.setdefault(key, []).append(entry)
+            uow.indent[key] = indent
+        return f"{os.path.join(*key)} (buffer)"
+
+    # --- query: kalau file punya perubahan tertunda, hitung dari buffer ---
+    def _buffered_rows(self, user_dir, filename):
+        uow = self._uow()
+        if uow is None or not uow.is_buffered(split_path(user_dir, filename)):
+            return None
+        data = self.load(user_dir, filename)
+        return data if isinstance(data, list) else []
+
+    def month_records(self, user_dir, filename, month):
+        rows = self._buffered_rows(user_dir, filename)
+        if rows is None:
+            return self.inner.month_records(user_dir, filename, month)
+        return scan_month_records(rows, month)
+
+    def type_totals(self, user_dir, filename, month=None):
+        rows = self._buffered_rows(user_dir, filename)
+        if rows is None:
+            return self.inner.type_totals(user_dir, filename, month)
+        return scan_type_totals(rows, month)
+
+    def monthly_totals(self, user_dir, filename):
+        rows = self._buffered_rows(user_dir, filename)
+        if rows is None:
+            return self.inner.monthly_totals(user_dir, filename)
+        return scan_monthly_totals(rows)
+
+    def loan_payments(self, user_dir):
+        rows = self._buffered_rows(user_dir, "cashflow.json")
+        if rows is None:
+            return self.inner.loan_payments(user_dir)
+        return scan_loan_payments(rows)
+
+    def rebuild_aggregates(self, user_dir):
+        return self.inner.rebuild_aggregates(user_dir)
+
+    # --- flush ---
+    def flush(self, uow):
+        """Tulis semua perubahan request ke backend asli (1x per file). Raise FlushError kalau ada yang gagal."""
+        written, errors = 0, []
+        for key, indent in uow.dirty.items():
+            if key in uow.versions and self.inner.version(*key) != uow.versions[key]:
+                # worker lain menulis file ini setelah dibaca → jangan timpa perubahannya
+                errors.append(f"flush {key[1]}: diubah request lain sejak dibaca")
+                continue
+            try:
+                self.inner.save(*key, uow.docs[key], indent)
+                written += 1
+            except Exception as e:
+                errors.append(f"flush {key[1]}: {e}")
+        for key, entries in uow.pending.items():
+            for entry in entries:
+                try:
+                    self.inner.append(*key, entry, uow.indent.get(key, 4))
+                    written += 1
+                except Exception as e:
+                    errors.append(f"append {key[1]}: {e}")
+        if errors:
+            raise FlushError(errors)
+        return written
+
+
+backend = UnitOfWorkBackend(storage.backend)
+
+
+def init_app(app):
+    """Daftarkan flush unit-of-work sebelum response setiap request dikirim"""
+
+    @app.after_request
+    def _flush_unit_of_work(response):
+        if response.status_code >= 500:
+            return response  # request gagal → dibuang di teardown
+        uow = g.pop("_uow", None)
+        if uow is None or not (uow.dirty or uow.pending):
+            return response
+        try:
+            backend.flush(uow)
+        except FlushError as e:
+            print(f"[UOW] ERROR: perubahan gagal disimpan: {e}", file=sys.stderr)
+            app.logger.error("Unit of work gagal di-flush: %s", e)
+            session.pop("_flashes", None)
+            flash("Gagal menyimpan data, perubahan tidak tersimpan. Silakan coba lagi.", "danger")
+            raise
+        return response
+
+    @app.teardown_request
+    def _discard_unit_of_work(exc):
+        uow = g.pop("_uow", None)
+        if uow is None or not (uow.dirty or uow.pending):
+            return
+        print(f"[UOW] Request gagal ({exc or 'status 5xx'}), "
+              f"{len(uow.dirty) + len(uow.pending)} perubahan dibatalkan")
@@ -0,0 +1,68 @@
+# === VALUASI PORTOFOLIO PER TANGGAL (tanpa jaringan) ===
+# Nilai pasar holding crypto / emas / saham dihitung dari price_history (harga as-of),
+# jadi valuasi akhir bulan dan tren PnL cukup baca deret waktu lokal.
+# Holding tanpa observasi harga pada tanggal itu (atau aset non-pasar: tanah, bisnis)
+# memakai current_value / amount_idr yang tersimpan, sama seperti perilaku lama.
+
+import prices
+from price_history import month_end
+
+
+MARKET_CATEGORIES = ("crypto", "gold", "stock")
+UNITS_PER_LOT = {"stock": 100}
+
+
+def price_key(inv):
+    """Key quote untuk 1 holding (atau None untuk aset non-pasar)"""
+    cat = inv.get("category")
+    asset = (inv.get("asset") or "").strip()
+    if cat == "crypto" and asset:
+        return prices.crypto_key(asset)
+    if cat == "stock" and asset:
+        return prices.stock_key(asset)
+    if cat == "gold":
+        return "gold"
+    return None
+
+
+def _float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def value_at(investment, ts, cutoff=None):
+    """
+    Valuasi holding per epoch ts: {"by_category", "cost", "value", "pnl"}.
+    cutoff ('YYYY-MM-DD' / 'YYYY-MM') = hanya holding yang dibeli sampai tanggal itu.
+    """
+    history = prices.history
+    by_category, cost, value = {}, 0.0, 0.0
+    for inv in investment:
+        if not isinstance(inv, dict):
+            continue
+        if cutoff and (inv.get("date") or "")[:len(cutoff)] > cutoff:
+            continue
+        cat = inv.get("category") or ""
+        paid = _float(inv.get("amount_idr", inv.get("amount", 0)))
+        now = _float(inv.get("current_value", paid))
+        key = price_key(inv)
+        if key and history is not None:
+            price = history.as_of(key, ts)
+            if price is not None:
+                now = _float(inv.get("entry_amount")) * price * UNITS_PER_LOT.get(cat, 1)
+        by_category[cat] = by_category.get(cat, 0) + now
+        cost += paid
+        value += now
+    return {
+        "by_category": by_category,
+        "cost": cost,
+        "value": value,
+        "pnl": round((value - cost) / cost * 100, 2) if cost else 0,
+    }
+
+
+def month_end_values(investment, months):
+    """{'YYYY-MM': valuasi akhir bulan} untuk holding yang sudah dibeli di bulan itu"""
+    return {month: value_at(investment, month_end(month), cutoff=month) for month in months}
@@ -0,0 +1,73 @@
+# === BENCHMARK: agregasi cashflow (loop dict vs kolom NumPy) ===
+# Jalankan dari root repo:
+#   python benchmarks/bench_columnar.py [jumlah_baris ...]
+# Membandingkan get_monthly_summary versi lama (strptime + loop dict) dengan
+# LedgerColumns (build 1x per versi file + query bincount).
+
+import os, sys, time, random, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+from columnar import LedgerColumns  # noqa: E402
+
+
+def synthetic_rows(n, years=5, seed=42):
+    rnd = random.Random(seed)
+    start = datetime.date.today().year - years + 1
+    types = ["expense"] * 6 + ["investment"] * 3 + ["income"]
+    categories = ["Makan", "Transport", "Loan", "emergency", "crypto", "Belanja", "Tagihan"]
+    return [{
+        "date": f"{rnd.randint(start, start + years - 1)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        "type": rnd.choice(types),
+        "category": rnd.choice(categories),
+        "amount": rnd.randint(1, 500) * 1000,
+        "note": "",
+    } for _ in range(n)]
+
+
+def loop_summary(rows):
+    """Pola lama: parse tanggal per baris, jumlahkan ke dict per bulan"""
+    monthly = {m: {"expense": 0, "investment": 0} for m in range(1, 13)}
+    for c in rows:
+        try:
+            d = datetime.datetime.strptime(c.get("date", ""), "%Y-%m-%d")
+        except Exception:
+            continue
+        t = c.get("type")
+        if t in monthly[d.month]:
+            monthly[d.month][t] += float(c.get("amount", 0))
+    return monthly
+
+
+def columnar_summary(cols):
+    monthly = {m: {"expense": 0, "investment": 0} for m in range(1, 13)}
+    for label, totals in cols.monthly_totals().items():
+        m = int(label[5:7])
+        for t in monthly[m]:
+            monthly[m][t] += totals.get(t, 0)
+    return monthly
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'loop':>10} {'build':>10} {'query':>10} {'speedup':>9}")
+    for n in sizes:
+        rows = synthetic_rows(n)
+        t_loop, expected = timed(lambda: loop_summary(rows))
+        t_build, cols = timed(lambda: LedgerColumns(rows, default_type="expense"), repeat=1)
+        t_query, got = timed(lambda: columnar_summary(cols))
+        assert got == expected, "hasil columnar berbeda dengan loop"
+        print(f"{n:>10} {t_loop * 1000:>8.1f}ms {t_build * 1000:>8.1f}ms "
+              f"{t_query * 1000:>8.2f}ms {t_loop / t_query:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
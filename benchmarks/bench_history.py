@@ -0,0 +1,108 @@
+# === BENCHMARK: /history (5 tahun data) ===
+# Jalankan dari root repo:
+#   python benchmarks/bench_history.py [transaksi_per_bulan]
+# Membandingkan history_panel versi lama (json.load tiap snapshot + load cashflow.json
+# per snapshot + 3 pass filter per bulan) dengan versi baru (listing direktori +
+# 1x monthly_totals dari agregat ledger).
+
+import os, sys, json, time, random, shutil, tempfile, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+import storage  # noqa: E402
+import columnar  # noqa: E402
+from doc_cache import cache  # noqa: E402
+
+YEARS = 5
+
+
+def build_user(user_dir, per_month, seed=7):
+    rnd = random.Random(seed)
+    start = datetime.date.today().year - YEARS + 1
+    months = [f"{y}-{m:02d}" for y in range(start, start + YEARS) for m in range(1, 13)]
+    rows = [{
+        "date": f"{month}-{rnd.randint(1, 28):02d}",
+        "type": rnd.choice(["expense", "expense", "investment", "income"]),
+        "category": rnd.choice(["Makan", "Transport", "Loan", "Investment Crypto"]),
+        "amount": rnd.randint(1, 500) * 1000,
+        "note": "",
+    } for month in months for _ in range(per_month)]
+
+    # format lama: 1 file cashflow.json
+    legacy = os.path.join(user_dir, "legacy")
+    os.makedirs(legacy)
+    with open(os.path.join(legacy, "cashflow.json"), "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+
+    # format sekarang: ledger partisi bulanan
+    storage.JsonBackend().save(user_dir, "cashflow.json", rows)
+
+    history = os.path.join(user_dir, "history")
+    os.makedirs(history)
+    for month in months:
+        snapshot = {"month": month, "cashflow": [r for r in rows if r["date"].startswith(month)]}
+        with open(os.path.join(history, f"{month}.json"), "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2)
+    return len(rows), len(months)
+
+
+def old_history(user_dir):
+    history_dir = os.path.join(user_dir, "history")
+    histories = []
+    for fname in sorted([f for f in os.listdir(history_dir) if f.endswith(".json")], reverse=True):
+        month = fname.replace(".json", "")
+        with open(os.path.join(history_dir, fname), encoding="utf-8") as f:
+            _ = json.load(f)
+        with open(os.path.join(user_dir, "legacy", "cashflow.json"), encoding="utf-8") as f:
+            cashflow = json.load(f)
+        totals = {
+            t: sum(float(c.get("amount", 0)) for c in cashflow
+                   if c.get("type") == t and c.get("date", "").startswith(month))
+            for t in ("income", "expense", "investment")
+        }
+        histories.append((month, totals))
+    return histories
+
+
+def new_history(user_dir, backend):
+    history_dir = os.path.join(user_dir, "history")
+    files = [e.name for e in os.scandir(history_dir) if e.name.endswith(".json") and e.is_file()]
+    cashflow_months = backend.monthly_totals(user_dir, "cashflow.json")
+    histories = []
+    for fname in sorted(files, reverse=True):
+        totals = cashflow_months.get(fname[:-5], {})
+        histories.append((fname[:-5], {t: totals.get(t, 0) for t in ("income", "expense", "investment")}))
+    return histories
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main(per_month):
+    root = tempfile.mkdtemp(prefix="bukabox-bench-")
+    try:
+        user_dir = os.path.join(root, "user")
+        n_rows, n_months = build_user(user_dir, per_month)
+        backend = storage.JsonBackend()
+        # mulai dingin: tanpa aggregates.json dan tanpa cache di memori
+        os.remove(os.path.join(user_dir, "aggregates.json"))
+        columnar._cache.clear()
+        cache.clear()
+
+        t_old, expected = timed(lambda: old_history(user_dir))
+        t_cold, got = timed(lambda: new_history(user_dir, backend))
+        t_warm, _ = timed(lambda: new_history(user_dir, backend))
+        assert got == expected, "hasil history berbeda dengan versi lama"
+
+        print(f"{n_months} snapshot, {n_rows} transaksi")
+        print(f"  lama                 : {t_old * 1000:8.1f} ms")
+        print(f"  baru (agregat dingin): {t_cold * 1000:8.1f} ms  ({t_old / t_cold:.0f}x)")
+        print(f"  baru (agregat siap)  : {t_warm * 1000:8.1f} ms  ({t_old / t_warm:.0f}x)")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,102 @@
+# === BENCHMARK: halaman yang butuh harga (offline, provider di-replay) ===
+# Jalankan dari root repo:
+#   python benchmarks/bench_prices.py [jumlah_request] [latency_ms] [failure_rate]
+# App disalin ke folder sementara (data user terpisah) dan semua provider harga dijawab
+# ReplayAdapter dari benchmarks/fixtures/prices.json, jadi hasil bisa diulang tanpa jaringan.
+# Skenario:
+#   hangat  : quote sudah di cache → murni hot path app (index, investment, add_stock)
+#   dingin  : cache quote dikosongkan tiap request → termasuk latency provider + hedging
+#   gagal   : seperti dingin, dengan kegagalan buatan di transport
+
+import os, sys, time, shutil, tempfile, datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures", "prices.json")
+
+
+def setup(root, latency_ms):
+    shutil.copytree(os.path.join(HERE, "..", "app"), os.path.join(root, "app"),
+                    ignore=shutil.ignore_patterns("__pycache__", "data"))
+    os.environ.update({
+        "BUKABOX_PRICE_MODE": "replay",
+        "BUKABOX_PRICE_FIXTURES": FIXTURES,
+        "BUKABOX_PRICE_LATENCY": str(latency_ms),
+        "BUKABOX_PRICE_SEED": "42",
+        "BUKABOX_PRICE_CACHE": "0",
+        "BUKABOX_PRICE_REFRESHER": "0",
+    })
+    os.chdir(os.path.join(root, "app"))
+    sys.path.insert(0, os.getcwd())
+    import main
+    main.app.config["TESTING"] = True
+    c = main.app.test_client()
+    c.post("/register", data={"username": "bench", "password": "p", "confirm": "p"})
+    c.post("/login", data={"username": "bench", "password": "p"})
+    today = datetime.date.today().isoformat()
+    for asset, price, amount in [("BTC", "1500000000", "0.01"), ("ETH", "50000000", "0.5"), ("SOL", "3000000", "4")]:
+        c.post("/add_invest", data={"date": today, "category": "crypto", "asset": asset,
+                                    "entry_price": price, "entry_amount": amount})
+    for sym in ["BBCA", "BBRI", "TLKM"]:
+        c.post("/add_stock", data={"date": today, "asset": sym, "entry_price": "5000", "amount_idr": "1000000"})
+    c.post("/add_gold", data={"date": today, "entry_price": "1300000", "amount_idr": "2600000"})
+    return main, c
+
+
+def run(c, n, before=None):
+    today = datetime.date.today().isoformat()
+    routes = {
+        "index": lambda: c.get("/"),
+        "investment": lambda: c.get("/investment"),
+        "add_stock": lambda: c.post("/add_stock", data={"date": today, "asset": "BMRI",
+                                                         "entry_price": "6000", "amount_idr": "600000"}),
+    }
+    out = {}
+    for name, call in routes.items():
+        times = []
+        for _ in range(n):
+            if before:
+                before()
+            t0 = time.perf_counter()
+            r = call()
+            times.append(time.perf_counter() - t0)
+            assert r.status_code in (200, 302), (name, r.status_code)
+        times.sort()
+        out[name] = (times[len(times) // 2], times[int(len(times) * 0.95) - 1 if n >= 20 else -1])
+    return out
+
+
+def report(label, result):
+    print(label)
+    for name, (p50, p95) in result.items():
+        print(f"  {name:<11}: p50 {p50 * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms")
+
+
+def main(n, latency_ms, failure_rate):
+    root = tempfile.mkdtemp(prefix="bukabox-bench-")
+    cwd = os.getcwd()
+    try:
+        app_main, c = setup(root, latency_ms)
+        import prices, price_http, price_replay
+
+        def cold():
+            with prices.service._lock:
+                prices.service._quotes.clear()
+
+        report(f"hangat ({n} request/route)", run(c, n))
+        report(f"dingin (latency provider {latency_ms} ms)", run(c, n, before=cold))
+        adapter = price_http.install(price_replay.ReplayAdapter(
+            price_replay._load(FIXTURES), latency=price_replay._latency(str(latency_ms)),
+            failure_rate=failure_rate, seed=42,
+        ))
+        report(f"gagal {failure_rate:.0%} (dingin)", run(c, n, before=cold))
+        print(f"replay: {adapter.calls} request, {adapter.misses} tanpa fixture")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 20,
+         args[1] if len(args) > 1 else "20-80",
+         float(args[2]) if len(args) > 2 else 0.2)